@@ -0,0 +1,246 @@
+"""Approximate nearest-neighbor backend (inverted-file index).
+
+The scaled training matrix is partitioned with k-means into ``n_lists``
+cells.  A query only searches the ``nprobe`` cells whose centroids are
+closest, so search cost scales with ``nprobe / n_lists`` of the registry
+instead of all of it; ``nprobe`` is the recall-vs-latency knob (``nprobe ==
+n_lists`` is exact search).  ``ApproxKNN`` is a drop-in replacement for the
+engine's fused kernel::
+
+    engine = RiskEngine.load("knn_heart_model.knnz", ann_index="ann_index.npz", nprobe=4)
+
+The index records a hash and the row count of the training matrix it was
+built from, and refuses to attach to any other model.  ``train.py
+--ann-index`` builds it alongside each exported model; to build one for the
+current model and report how it compares with exact search on the held-out
+split::
+
+    python ann.py --n-lists 16 --nprobe 1 2 4 8 -o ann_index.npz --report ann_report.json
+"""
+import argparse
+import hashlib
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import FEATURE_COLUMNS, FusedKNN, RiskEngine
+
+INDEX_FILE = "ann_index.npz"
+
+
+# Upper bound on one block of point-to-centroid distances, in float64 cells (32 MB)
+ASSIGN_CHUNK_CELLS = 1 << 22
+
+
+def assign(X, centroids):
+    """Index of the nearest centroid of every row, computed in bounded row blocks."""
+    chunk_rows = max(1, ASSIGN_CHUNK_CELLS // len(centroids))
+    centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(X), dtype=np.intp)
+    for start in range(0, len(X), chunk_rows):
+        block = X[start:start + chunk_rows]
+        # |x|^2 is the same for every centroid, so it does not change the argmin
+        d2 = centroid_sq - 2 * block @ centroids.T
+        labels[start:start + len(block)] = np.argmin(d2, axis=1)
+    return labels
+
+
+def kmeans(X, n_clusters, n_iter=25, seed=0):
+    """Plain Lloyd's k-means; returns (centroids, labels)."""
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(len(X), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = assign(X, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        for j in range(X.shape[1]):
+            centroids[:, j] = np.bincount(labels, weights=X[:, j], minlength=n_clusters)
+        filled = counts > 0
+        centroids[filled] /= counts[filled, None]
+        # Re-seed empty cells so every list stays usable
+        empty = np.flatnonzero(~filled)
+        centroids[empty] = X[rng.integers(len(X), size=len(empty))]
+    return centroids, labels
+
+
+def training_sha256(fit_X):
+    """Hash of a (scaled) training matrix, identifying the model an index belongs to."""
+    return hashlib.sha256(np.ascontiguousarray(fit_X, dtype=np.float64)).hexdigest()
+
+
+class IVFIndex:
+    """Training-row ids grouped by their nearest k-means centroid."""
+
+    def __init__(self, centroids, order, offsets, model_sha256=None):
+        self.centroids = centroids
+        self.order = order      # training row ids, grouped by cell
+        self.offsets = offsets  # cell c holds order[offsets[c]:offsets[c + 1]]
+        self.model_sha256 = model_sha256
+
+    @classmethod
+    def build(cls, fit_X, n_lists=None, seed=0, sample_per_list=256):
+        """Cluster ``fit_X`` into ``n_lists`` cells (default ``sqrt(len(fit_X))``).
+
+        Centroids are fitted on a random sample of ``sample_per_list`` rows
+        per cell, then every row is assigned to its nearest centroid.
+        """
+        fit_X = np.asarray(fit_X, dtype=float)
+        n_lists = n_lists or max(1, int(np.sqrt(len(fit_X))))
+        rng = np.random.default_rng(seed)
+        sample_rows = min(len(fit_X), n_lists * sample_per_list)
+        sample = fit_X[np.sort(rng.choice(len(fit_X), sample_rows, replace=False))]
+        centroids, _ = kmeans(sample, n_lists, seed=seed)
+        labels = assign(fit_X, centroids)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+        return cls(centroids, order, offsets, training_sha256(fit_X))
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def n_rows(self):
+        return len(self.order)
+
+    def save(self, path=INDEX_FILE):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 model_sha256=np.array(self.model_sha256 or ""))
+
+    @classmethod
+    def load(cls, path=INDEX_FILE):
+        with np.load(path) as data:
+            model_sha256 = str(data["model_sha256"]) if "model_sha256" in data else None
+            return cls(data["centroids"], data["order"], data["offsets"], model_sha256 or None)
+
+    def check(self, fit_X):
+        """Raise ``ValueError`` unless this index was built from ``fit_X``."""
+        if self.n_rows != len(fit_X):
+            problem = f"indexes {self.n_rows} training rows, the model has {len(fit_X)}"
+        elif self.model_sha256 != training_sha256(fit_X):
+            problem = "was built from a different training matrix"
+        else:
+            return
+        raise ValueError(f"the ANN index {problem}; rebuild it with ann.py or train.py --ann-index")
+
+    def candidates(self, z, nprobe, min_count):
+        """Row ids in the ``nprobe`` closest cells, widened until ``min_count`` are found."""
+        d2 = ((self.centroids - z) ** 2).sum(axis=1)
+        lists, found = [], 0
+        for c in np.argsort(d2):
+            if len(lists) >= nprobe and found >= min_count:
+                break
+            lists.append(self.order[self.offsets[c]:self.offsets[c + 1]])
+            found += len(lists[-1])
+        return np.concatenate(lists)
+
+
+class ApproxKNN(FusedKNN):
+    """``FusedKNN`` whose neighbor search only visits ``nprobe`` IVF cells."""
+
+    def __init__(self, mean, scale, fit_X, y, n_classes, n_neighbors, weights, index, nprobe=1):
+        super().__init__(mean, scale, fit_X, y, n_classes, n_neighbors, weights)
+        self.index = index
+        self.nprobe = nprobe
+
+    @classmethod
+    def from_kernel(cls, kernel, index, nprobe=1):
+        """Wrap an exact ``FusedKNN``; ``index`` must have been built from its training matrix."""
+        index.check(kernel.fit_X)
+        return cls(kernel.mean, kernel.scale, kernel.fit_X,
+                   kernel.y, kernel.n_classes, kernel.n_neighbors, kernel.weights, index, nprobe)
+
+    def kneighbors(self, Z):
+        n, k = len(Z), self.n_neighbors
+        dist = np.empty((n, k))
+        ind = np.empty((n, k), dtype=np.intp)
+        for i, z in enumerate(Z):
+            cand = self.index.candidates(z, self.nprobe, k)
+            d = np.sqrt(((self.fit_X[cand] - z) ** 2).sum(axis=1))
+            top = np.argsort(d, kind="stable")[:k]
+            ind[i] = cand[top]
+            dist[i] = d[top]
+        return dist, ind
+
+
+def _single_query_ms(kernel, Z, limit=200):
+    samples = []
+    for z in Z[:limit]:
+        start = time.perf_counter()
+        kernel.predict_proba(*kernel.kneighbors(z[None, :]))
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples) * 1000)
+
+
+def compare_with_exact(exact, approx, X, y_true=None):
+    """Recall, prediction agreement, accuracy and latency of ``approx`` vs ``exact``.
+
+    ``X`` holds raw (unscaled) held-out rows; both kernels must share a model.
+    """
+    Z = exact.standardize(np.asarray(X, dtype=float))
+    exact_dist, exact_ind = exact.kneighbors(Z)
+    approx_dist, approx_ind = approx.kneighbors(Z)
+    exact_proba = exact.predict_proba(exact_dist, exact_ind)
+    approx_proba = approx.predict_proba(approx_dist, approx_ind)
+    exact_pred, approx_pred = exact_proba.argmax(axis=1), approx_proba.argmax(axis=1)
+
+    recall = np.mean([len(np.intersect1d(e, a)) / exact.n_neighbors
+                      for e, a in zip(exact_ind, approx_ind)])
+    report = {
+        "nprobe": approx.nprobe,
+        "n_lists": approx.index.n_lists,
+        "recall_at_k": float(recall),
+        "prediction_agreement": float(np.mean(exact_pred == approx_pred)),
+        "probability_mae": float(np.abs(exact_proba - approx_proba).max(axis=1).mean()),
+        "exact_query_ms": _single_query_ms(exact, Z),
+        "approx_query_ms": _single_query_ms(approx, Z),
+    }
+    if y_true is not None:
+        y_true = np.asarray(y_true)
+        report["exact_accuracy"] = float(np.mean(exact_pred == y_true))
+        report["approx_accuracy"] = float(np.mean(approx_pred == y_true))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an IVF index and compare it with exact KNN.")
+    parser.add_argument("--model", default="knn_heart_model.pkl")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--data", default="heart.csv")
+    parser.add_argument("--n-lists", type=int, default=None,
+                        help="k-means cells (default: sqrt of the training rows)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("-o", "--output", default=INDEX_FILE)
+    parser.add_argument("--report", default="ann_report.json")
+    args = parser.parse_args(argv)
+
+    engine = RiskEngine.load(args.model, args.scaler)
+    if engine.kernel is None:
+        raise SystemExit("the approximate backend needs a Euclidean KNN model")
+    index = IVFIndex.build(engine.kernel.fit_X, args.n_lists)
+    index.save(args.output)
+
+    # Held-out rows: the test side of the split the model was trained with
+    from sklearn.model_selection import train_test_split
+
+    df = pd.read_csv(args.data)
+    _, held_out = train_test_split(df, test_size=engine.metadata.get("test_size", 0.2),
+                                   random_state=engine.metadata.get("random_state", 42))
+    X = held_out[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+    reports = []
+    for nprobe in args.nprobe:
+        approx = ApproxKNN.from_kernel(engine.kernel, index, min(nprobe, index.n_lists))
+        reports.append(compare_with_exact(engine.kernel, approx, X, held_out["target"]))
+        r = reports[-1]
+        print(f"nprobe={r['nprobe']:>3}/{r['n_lists']}: recall@k {r['recall_at_k']:.3f}, "
+              f"agreement {r['prediction_agreement']:.3f}, "
+              f"{r['approx_query_ms']:.3f} ms vs exact {r['exact_query_ms']:.3f} ms")
+    with open(args.report, "w") as f:
+        json.dump(reports, f, indent=2)
+    print(f"Wrote {args.output} and {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 import streamlit as st
 import numpy as np
-import pickle
-import pandas as pd
-from datetime import datetime
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import timings
+from engine import (PredictionCache, encode_patient, training_positions, FEATURE_COLUMNS, SEX_MAP,
+                    YES_NO_MAP, CP_MAP, RESTECG_MAP, SLOPE_MAP, CA_MAP, THAL_MAP)
 
 # ---------------- PAGE CONFIG ----------------
 st.set_page_config(
@@ -14,578 +19,106 @@ st.set_page_config(
 
 # ---------------- LOAD MODEL ----------------
 @st.cache_resource
-def load_model():
-    model = pickle.load(open("knn_heart_model.pkl", "rb"))
-    scaler = pickle.load(open("scaler.pkl", "rb"))
-    return model, scaler
+def get_timings():
+    # One recorder per process, so percentiles cover every session
+    return timings.LatencyRecorder()
 
-model, scaler = load_model()
+def load_lookup_table(model_path, path="lookup_table.npy"):
+    # Memory-mapped lazily; ignored if missing or built for a different model file
+    import lookup
 
-# ---------------- CUSTOM CSS ----------------
-st.markdown(
-    """
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;700;900&family=Rajdhani:wght@300;400;600;700&display=swap');
-    
-    .stApp {
-        font-family: 'Rajdhani', sans-serif;
-        background: linear-gradient(135deg, #000000, #0a0a1a, #0f0f2e);
-    }
-    
-    /* Animated background with stronger effects */
-    .stApp::before {
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background-image: 
-            radial-gradient(circle at 20% 50%, rgba(0, 255, 255, 0.25) 0%, transparent 50%),
-            radial-gradient(circle at 80% 80%, rgba(138, 43, 226, 0.25) 0%, transparent 50%),
-            radial-gradient(circle at 40% 20%, rgba(255, 0, 255, 0.2) 0%, transparent 40%);
-        pointer-events: none;
-        z-index: 0;
-        animation: bgPulse 8s ease-in-out infinite;
-    }
-    
-    @keyframes bgPulse {
-        0%, 100% { opacity: 1; }
-        50% { opacity: 0.6; }
-    }
-    
-    /* Stronger grid overlay */
-    .stApp::after {
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background-image: 
-            linear-gradient(rgba(0, 255, 255, 0.08) 2px, transparent 2px),
-            linear-gradient(90deg, rgba(0, 255, 255, 0.08) 2px, transparent 2px);
-        background-size: 50px 50px;
-        pointer-events: none;
-        z-index: 0;
-        animation: gridMove 25s linear infinite;
-    }
-    
-    @keyframes gridMove {
-        0% { transform: translate(0, 0); }
-        100% { transform: translate(50px, 50px); }
-    }
-    
-    /* Enhanced glass cards */
-    .glass-card {
-        background: linear-gradient(135deg, rgba(15, 15, 40, 0.95), rgba(20, 20, 50, 0.9));
-        border-radius: 25px;
-        padding: 40px;
-        margin: 20px 0;
-        backdrop-filter: blur(20px);
-        border: 3px solid rgba(0, 255, 255, 0.5);
-        box-shadow: 
-            0 10px 40px rgba(0, 0, 0, 0.7),
-            0 0 30px rgba(0, 255, 255, 0.3),
-            inset 0 2px 0 rgba(255, 255, 255, 0.15);
-        position: relative;
-        z-index: 1;
-        transition: all 0.4s ease;
-    }
-    
-    .glass-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 
-            0 15px 50px rgba(0, 0, 0, 0.8),
-            0 0 50px rgba(0, 255, 255, 0.5),
-            inset 0 2px 0 rgba(255, 255, 255, 0.2);
-        border-color: rgba(0, 255, 255, 0.8);
-    }
-    
-    /* Header */
-    .main-header {
-        text-align: center;
-        padding: 60px 20px 40px 20px;
-        position: relative;
-        z-index: 1;
-        background: linear-gradient(180deg, rgba(0, 255, 255, 0.1), transparent);
-        border-radius: 20px;
-        margin-bottom: 30px;
-    }
-    
-    .main-title {
-        font-family: 'Orbitron', sans-serif;
-        font-size: 68px;
-        font-weight: 900;
-        background: linear-gradient(135deg, #00ffff, #00d4ff, #a770ff, #ff00ff);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        margin-bottom: 20px;
-        letter-spacing: 5px;
-        animation: titleGlow 3s ease-in-out infinite alternate;
-        filter: drop-shadow(0 0 20px rgba(0, 255, 255, 0.8));
-    }
-    
-    @keyframes titleGlow {
-        from { 
-            filter: drop-shadow(0 0 20px rgba(0, 255, 255, 0.8));
-            transform: scale(1);
-        }
-        to { 
-            filter: drop-shadow(0 0 40px rgba(167, 112, 255, 1));
-            transform: scale(1.02);
-        }
-    }
-    
-    .subtitle {
-        font-size: 26px;
-        color: #00ffff;
-        font-weight: 600;
-        letter-spacing: 4px;
-        text-transform: uppercase;
-        text-shadow: 0 0 15px rgba(0, 255, 255, 0.8);
-        animation: subtitleFade 2s ease-in-out infinite;
-    }
-    
-    @keyframes subtitleFade {
-        0%, 100% { opacity: 0.9; }
-        50% { opacity: 1; }
-    }
-    
-    /* Section headers - MUCH MORE VISIBLE */
-    .section-header {
-        font-family: 'Orbitron', sans-serif;
-        font-size: 36px;
-        font-weight: 900;
-        color: #00ffff;
-        margin-bottom: 30px;
-        padding: 20px;
-        background: linear-gradient(90deg, rgba(0, 255, 255, 0.2), rgba(167, 112, 255, 0.2));
-        border-left: 6px solid #00ffff;
-        border-radius: 10px;
-        letter-spacing: 3px;
-        text-shadow: 0 0 25px rgba(0, 255, 255, 1);
-        box-shadow: 0 0 20px rgba(0, 255, 255, 0.4);
-    }
-    
-    /* Subheaders for columns - VERY VISIBLE */
-    h4 {
-        font-family: 'Orbitron', sans-serif !important;
-        font-size: 24px !important;
-        font-weight: 700 !important;
-        color: #ffffff !important;
-        text-shadow: 0 0 15px rgba(0, 255, 255, 0.8) !important;
-        margin-bottom: 25px !important;
-        padding: 15px !important;
-        background: linear-gradient(90deg, rgba(0, 255, 255, 0.15), transparent) !important;
-        border-left: 4px solid #00ffff !important;
-        border-radius: 8px !important;
-    }
-    
-    /* ALL LABELS - MAXIMUM VISIBILITY */
-    .stMarkdown label,
-    label {
-        color: #ffffff !important;
-        font-weight: 700 !important;
-        font-size: 18px !important;
-        text-shadow: 0 0 8px rgba(0, 255, 255, 0.6) !important;
-        letter-spacing: 1px !important;
-        margin-bottom: 10px !important;
-        display: block !important;
-    }
-    
-    /* Slider labels - BRIGHT AND VISIBLE */
-    .stSlider label {
-        color: #00ffff !important;
-        font-weight: 800 !important;
-        font-size: 19px !important;
-        text-shadow: 0 0 10px rgba(0, 255, 255, 1) !important;
-    }
-    
-    /* Selectbox labels - BRIGHT AND VISIBLE */
-    .stSelectbox label {
-        color: #00ffff !important;
-        font-weight: 800 !important;
-        font-size: 19px !important;
-        text-shadow: 0 0 10px rgba(0, 255, 255, 1) !important;
-    }
-    
-    /* Enhanced slider styling */
-    .stSlider > div > div > div > div {
-        background: linear-gradient(90deg, #00ffff, #a770ff, #ff00ff) !important;
-        box-shadow: 0 0 15px rgba(0, 255, 255, 0.8) !important;
-    }
-    
-    .stSlider > div > div > div {
-        background: rgba(0, 255, 255, 0.2) !important;
-    }
-    
-    /* Slider thumb */
-    .stSlider [role="slider"] {
-        background: #00ffff !important;
-        box-shadow: 0 0 20px rgba(0, 255, 255, 1) !important;
-        border: 3px solid #ffffff !important;
-    }
-    
-    /* Enhanced selectbox styling */
-    .stSelectbox > div > div {
-        background: rgba(0, 50, 80, 0.8) !important;
-        border: 2px solid rgba(0, 255, 255, 0.6) !important;
-        border-radius: 12px !important;
-        color: #ffffff !important;
-        font-weight: 600 !important;
-        font-size: 17px !important;
-        box-shadow: 0 0 15px rgba(0, 255, 255, 0.4) !important;
-    }
-    
-    .stSelectbox > div > div:hover {
-        border-color: #00ffff !important;
-        box-shadow: 0 0 25px rgba(0, 255, 255, 0.7) !important;
-    }
-    
-    /* Selectbox dropdown text */
-    .stSelectbox [data-baseweb="select"] > div {
-        color: #ffffff !important;
-        font-weight: 600 !important;
-    }
-    
-    /* Button styling - MORE VIBRANT */
-    .stButton > button {
-        width: 100%;
-        height: 80px;
-        font-size: 28px;
-        font-weight: 900;
-        font-family: 'Orbitron', sans-serif;
-        background: linear-gradient(135deg, #00ffff, #00aaff, #a770ff, #ff00ff);
-        color: white;
-        border: none;
-        border-radius: 20px;
-        cursor: pointer;
-        transition: all 0.4s ease;
-        text-transform: uppercase;
-        letter-spacing: 4px;
-        box-shadow: 0 15px 50px rgba(0, 255, 255, 0.7);
-        position: relative;
-        overflow: hidden;
-        text-shadow: 0 0 10px rgba(0, 0, 0, 0.5);
-    }
-    
-    .stButton > button:before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(255, 255, 255, 0.4), transparent);
-        transition: left 0.6s;
-    }
-    
-    .stButton > button:hover:before {
-        left: 100%;
-    }
-    
-    .stButton > button:hover {
-        transform: scale(1.08) translateY(-3px);
-        box-shadow: 0 20px 60px rgba(167, 112, 255, 0.9);
-    }
-    
-    /* Character animations */
-    .character-container {
-        text-align: center;
-        margin: 50px 0;
-        position: relative;
-    }
-    
-    .character {
-        font-size: 240px;
-        display: inline-block;
-        filter: drop-shadow(0 0 40px rgba(0, 245, 255, 1));
-    }
-    
-    .happy-character {
-        animation: happy-bounce 1.8s ease-in-out infinite;
-    }
-    
-    @keyframes happy-bounce {
-        0%, 100% { 
-            transform: translateY(0px) rotate(-8deg) scale(1);
-        }
-        20% {
-            transform: translateY(-40px) rotate(8deg) scale(1.15);
-        }
-        50% { 
-            transform: translateY(0px) rotate(-8deg) scale(1);
-        }
-        70% {
-            transform: translateY(-20px) rotate(8deg) scale(1.08);
-        }
-    }
-    
-    .sad-character {
-        animation: sad-shake 0.8s ease-in-out infinite;
-        filter: drop-shadow(0 0 40px rgba(255, 0, 0, 1));
-    }
-    
-    @keyframes sad-shake {
-        0%, 100% { transform: translateX(0) rotate(0deg); }
-        25% { transform: translateX(-15px) rotate(-5deg); }
-        75% { transform: translateX(15px) rotate(5deg); }
-    }
-    
-    /* Result cards - MORE DRAMATIC */
-    .result-low-risk {
-        background: linear-gradient(135deg, rgba(0, 255, 127, 0.35), rgba(0, 255, 255, 0.35));
-        border: 5px solid #00ff7f;
-        border-radius: 30px;
-        padding: 60px;
-        text-align: center;
-        box-shadow: 
-            0 0 60px rgba(0, 255, 127, 0.8),
-            inset 0 0 30px rgba(0, 255, 127, 0.2);
-        animation: pulse-success 2s ease-in-out infinite;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .result-low-risk::before {
-        content: '';
-        position: absolute;
-        top: -50%;
-        left: -50%;
-        width: 200%;
-        height: 200%;
-        background: radial-gradient(circle, rgba(0, 255, 127, 0.15) 0%, transparent 70%);
-        animation: rotate 8s linear infinite;
-    }
-    
-    @keyframes pulse-success {
-        0%, 100% { 
-            box-shadow: 0 0 60px rgba(0, 255, 127, 0.8), inset 0 0 30px rgba(0, 255, 127, 0.2);
-            border-color: #00ff7f;
-        }
-        50% { 
-            box-shadow: 0 0 100px rgba(0, 255, 127, 1), inset 0 0 50px rgba(0, 255, 127, 0.4);
-            border-color: #00ffaa;
-        }
-    }
-    
-    .result-high-risk {
-        background: linear-gradient(135deg, rgba(255, 0, 0, 0.35), rgba(255, 69, 0, 0.35));
-        border: 5px solid #ff4444;
-        border-radius: 30px;
-        padding: 60px;
-        text-align: center;
-        box-shadow: 
-            0 0 60px rgba(255, 0, 0, 0.8),
-            inset 0 0 30px rgba(255, 0, 0, 0.2);
-        animation: pulse-danger 2s ease-in-out infinite;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .result-high-risk::before {
-        content: '';
-        position: absolute;
-        top: -50%;
-        left: -50%;
-        width: 200%;
-        height: 200%;
-        background: radial-gradient(circle, rgba(255, 0, 0, 0.15) 0%, transparent 70%);
-        animation: rotate 8s linear infinite;
-    }
-    
-    @keyframes pulse-danger {
-        0%, 100% { 
-            box-shadow: 0 0 60px rgba(255, 0, 0, 0.8), inset 0 0 30px rgba(255, 0, 0, 0.2);
-            border-color: #ff4444;
-        }
-        50% { 
-            box-shadow: 0 0 100px rgba(255, 0, 0, 1), inset 0 0 50px rgba(255, 0, 0, 0.4);
-            border-color: #ff6666;
-        }
-    }
-    
-    @keyframes rotate {
-        0% { transform: rotate(0deg); }
-        100% { transform: rotate(360deg); }
-    }
-    
-    .result-title {
-        font-family: 'Orbitron', sans-serif;
-        font-size: 48px;
-        font-weight: 900;
-        margin-bottom: 30px;
-        letter-spacing: 4px;
-        position: relative;
-        z-index: 1;
-        text-shadow: 0 0 20px rgba(255, 255, 255, 0.8);
-    }
-    
-    .result-message {
-        font-size: 22px;
-        line-height: 1.9;
-        font-weight: 500;
-        position: relative;
-        z-index: 1;
-        color: #ffffff;
-        text-shadow: 0 0 5px rgba(0, 0, 0, 0.8);
-    }
-    
-    /* Enhanced stat boxes */
-    .stat-box {
-        background: linear-gradient(135deg, rgba(0, 245, 255, 0.2), rgba(167, 112, 255, 0.2));
-        border: 3px solid rgba(0, 245, 255, 0.6);
-        border-radius: 18px;
-        padding: 28px;
-        text-align: center;
-        margin: 12px 0;
-        transition: all 0.3s ease;
-        box-shadow: 0 0 20px rgba(0, 245, 255, 0.4);
-    }
-    
-    .stat-box:hover {
-        transform: scale(1.08);
-        border-color: rgba(0, 245, 255, 1);
-        box-shadow: 0 0 35px rgba(0, 245, 255, 0.8);
-    }
-    
-    .stat-label {
-        font-size: 17px;
-        color: #ffffff;
-        text-transform: uppercase;
-        letter-spacing: 2px;
-        margin-bottom: 12px;
-        font-weight: 700;
-        text-shadow: 0 0 10px rgba(0, 255, 255, 0.8);
-    }
-    
-    .stat-value {
-        font-family: 'Orbitron', sans-serif;
-        font-size: 36px;
-        font-weight: 900;
-        color: #00ffff;
-        text-shadow: 0 0 20px rgba(0, 245, 255, 1);
-    }
-    
-    /* Sidebar styling */
-    section[data-testid="stSidebar"] {
-        background: linear-gradient(180deg, #000000, #0a0a1a, #0f0f2e);
-        border-right: 3px solid rgba(0, 255, 255, 0.4);
-    }
-    
-    section[data-testid="stSidebar"] h3 {
-        color: #00ffff !important;
-        font-weight: 800 !important;
-        text-shadow: 0 0 15px rgba(0, 255, 255, 0.8) !important;
-    }
-    
-    section[data-testid="stSidebar"] label {
-        color: #ffffff !important;
-        font-weight: 600 !important;
-    }
-    
-    /* Footer */
-    .footer {
-        text-align: center;
-        padding: 60px 20px;
-        color: #00ffff;
-        font-size: 16px;
-        letter-spacing: 1px;
-        border-top: 3px solid rgba(0, 245, 255, 0.5);
-        margin-top: 100px;
-        position: relative;
-        z-index: 1;
-        text-shadow: 0 0 10px rgba(0, 255, 255, 0.6);
-        background: linear-gradient(180deg, transparent, rgba(0, 255, 255, 0.1));
-    }
-    
-    /* Progress bar */
-    .stProgress > div > div > div > div {
-        background: linear-gradient(90deg, #00ffff, #a770ff, #ff00ff) !important;
-        box-shadow: 0 0 15px rgba(0, 255, 255, 0.8);
-    }
-    
-    /* Metrics - MORE VISIBLE */
-    [data-testid="stMetricValue"] {
-        color: #00ffff !important;
-        font-size: 32px !important;
-        font-weight: 900 !important;
-        text-shadow: 0 0 15px rgba(0, 255, 255, 1) !important;
-    }
-    
-    [data-testid="stMetricLabel"] {
-        color: #ffffff !important;
-        font-size: 18px !important;
-        font-weight: 700 !important;
-        text-shadow: 0 0 8px rgba(0, 255, 255, 0.6) !important;
-    }
-    
-    /* Dataframe styling */
-    .stDataFrame {
-        border: 2px solid rgba(0, 255, 255, 0.5);
-        border-radius: 10px;
-    }
-    
-    /* Hide default streamlit elements */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    .stDeployButton {display:none;}
-    
-    /* Floating particles - MORE VISIBLE */
-    .particle {
-        position: fixed;
-        width: 6px;
-        height: 6px;
-        background: #00ffff;
-        border-radius: 50%;
-        pointer-events: none;
-        z-index: 0;
-        animation: float-particle 12s linear infinite;
-        opacity: 0.9;
-        box-shadow: 0 0 15px #00ffff;
-    }
-    
-    @keyframes float-particle {
-        0% {
-            transform: translateY(100vh) translateX(0) scale(1);
-            opacity: 0;
-        }
-        10% {
-            opacity: 0.9;
-        }
-        90% {
-            opacity: 0.9;
-        }
-        100% {
-            transform: translateY(-100vh) translateX(150px) scale(0.7);
-            opacity: 0;
-        }
-    }
-    
-    /* Warning/Info boxes - BETTER VISIBILITY */
-    .stAlert {
-        background: rgba(15, 15, 40, 0.95) !important;
-        border: 3px solid rgba(0, 245, 255, 0.5) !important;
-        border-radius: 15px !important;
-        color: #ffffff !important;
-        font-weight: 600 !important;
-        font-size: 16px !important;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+    if not os.path.exists(path):
+        return None
+    table = lookup.LookupTable.open(path)
+    if table.model_sha256 != lookup.file_sha256(model_path):
+        return None
+    return table
+
+def load_training_patients(engine, path="heart.csv"):
+    # heart.csv rows in training-matrix order, rebuilt from the model's split
+    # without scikit-learn; ignored unless they are exactly the training matrix
+    import pandas as pd
+    from lookup import file_sha256
+
+    if not os.path.exists(path):
+        return None
+    if engine.metadata.get("data_sha256", file_sha256(path)) != file_sha256(path):
+        return None
+    rows = pd.read_csv(path)
+    train_rows = rows.iloc[training_positions(len(rows),
+                                              engine.metadata.get("test_size", 0.2),
+                                              engine.metadata.get("random_state", 42))]
+    if engine.kernel is None:
+        return train_rows if len(train_rows) == len(engine.model._fit_X) else None
+    scaled = engine.kernel.standardize(train_rows[FEATURE_COLUMNS].to_numpy(dtype=float))
+    if scaled.shape != engine.kernel.fit_X.shape or not np.allclose(scaled, engine.kernel.fit_X):
+        return None
+    return train_rows
 
-# ---------------- FLOATING PARTICLES ----------------
-particles_html = "<div style='position: fixed; top: 0; left: 0; width: 100%; height: 100%; pointer-events: none; z-index: 0;'>"
-for i in range(30):
-    left = np.random.randint(0, 100)
-    delay = np.random.randint(0, 12)
-    particles_html += f'<div class="particle" style="left: {left}%; animation-delay: {delay}s;"></div>'
-particles_html += "</div>"
-st.markdown(particles_html, unsafe_allow_html=True)
+def load_model(recorder):
+    # Runs in the background loader, so these imports stay off the page shell
+    import scheduler
+    import warmup
+
+    # The memory-mapped model file starts faster than unpickling, when exported
+    model_path = "knn_heart_model.knnz" if os.path.exists("knn_heart_model.knnz") else "knn_heart_model.pkl"
+    # Representative heart.csv rows exercise the scoring path before the first scan
+    # Approximate neighbor search is opt-in: CARDIAC_ANN_INDEX=ann_index.npz
+    engine, readiness = warmup.preload(model_path, "scaler.pkl",
+                                       cache=PredictionCache(maxsize=4096, ttl=3600),
+                                       lookup=load_lookup_table(model_path),
+                                       ann_index=os.environ.get("CARDIAC_ANN_INDEX"),
+                                       nprobe=int(os.environ.get("CARDIAC_ANN_NPROBE", 4)))
+    recorder.record("model_load", readiness["load_ms"] / 1000)
+    if "warmup_ms" in readiness:
+        recorder.record("warmup", readiness["warmup_ms"] / 1000)
+    # Concurrent sessions' scans are scored together, one batch per window
+    engine.scheduler = scheduler.BatchScheduler(
+        engine,
+        max_batch_size=int(os.environ.get("CARDIAC_MAX_BATCH_SIZE", 64)),
+        max_wait=float(os.environ.get("CARDIAC_MAX_WAIT_MS", 2.0)) / 1000
+    )
+    # Neighbor evidence needs these on the first scan; built here, off the request path
+    return engine, load_training_patients(engine)
+
+@st.cache_resource
+def start_model_loading():
+    # Loading and warming up the model is the slowest part of a cold start; it
+    # runs in the background while the page shell renders
+    executor = ThreadPoolExecutor(1, thread_name_prefix="model-warmup")
+    future = executor.submit(load_model, get_timings())
+    executor.shutdown(wait=False)
+    return future
+
+model_loader = start_model_loading()
+perf = get_timings()
+
+# ---------------- STATIC ASSETS ----------------
+# Built once per process: identical markup on every rerun lets Streamlit send
+# it to the browser by reference instead of re-streaming it
+@st.cache_resource
+def load_css(path="assets/style.css"):
+    with open(path) as f:
+        return f"<style>{f.read()}</style>"
+
+@st.cache_resource
+def build_particles_html(count=30, seed=7):
+    rng = np.random.default_rng(seed)
+    particles = "".join(
+        f'<div class="particle" style="left: {left}%; animation-delay: {delay}s;"></div>'
+        for left, delay in zip(rng.integers(0, 100, count), rng.integers(0, 12, count))
+    )
+    return ("<div style='position: fixed; top: 0; left: 0; width: 100%; height: 100%; "
+            f"pointer-events: none; z-index: 0;'>{particles}</div>")
+
+# Stops the animated background, particles and hover transitions
+PERFORMANCE_CSS = """
+<style>
+.stApp::before, .stApp::after { display: none !important; }
+*, *::before, *::after { animation: none !important; transition: none !important; }
+.glass-card { backdrop-filter: none !important; }
+</style>
+"""
 
 # ---------------- SIDEBAR ----------------
 with st.sidebar:
@@ -595,6 +128,20 @@ with st.sidebar:
     show_charts = st.checkbox("📊 Show Data Visualizations", value=True)
     show_stats = st.checkbox("📈 Show Statistics Dashboard", value=True)
     show_recommendations = st.checkbox("💡 Show Health Recommendations", value=True)
+    show_neighbors = st.checkbox("🔎 Show Nearest-Patient Evidence", value=True,
+                                 help="The training patients behind this prediction")
+    show_progress = st.checkbox("⏱️ Show Pipeline Progress", value=True,
+                                help="Display measured timings of each inference stage")
+    performance_mode = st.checkbox("🚀 Performance Mode", value=False,
+                                   help="Disable the animated background for low-end terminals")
+    live_preview = st.checkbox("🔴 Live Preview", value=False,
+                               help="Re-score while inputs change instead of on submit")
+    if live_preview:
+        preview_rate = st.slider("Live preview rate (scans/sec)", 1, 10, 2)
+    show_history = st.checkbox("🗂️ Show Assessment History", value=False,
+                               help="Browse every stored assessment")
+    show_performance = st.checkbox("⏱️ Show Performance Panel", value=False,
+                                   help="Latency percentiles of every stage across all sessions")
     
     st.markdown("---")
     st.markdown("### ℹ️ ABOUT")
@@ -612,7 +159,21 @@ with st.sidebar:
     st.markdown("### 🔧 QUICK STATS")
     st.metric("Model Type", "KNN")
     st.metric("Features", "13")
-    st.metric("Status", "✅ Active")
+    # Updated once the background model warm-up has finished
+    status_slot = st.empty()
+    status_slot.metric("Status", "✅ Active" if model_loader.done() else "⏳ Warming Up")
+    # Filled in after the prediction section so the counts include this run
+    cache_hits_slot = st.empty()
+    cache_misses_slot = st.empty()
+    # Filled at the end of the script so this run's timings are included
+    performance_slot = st.container() if show_performance else None
+
+# ---------------- STYLING ----------------
+st.markdown(load_css(), unsafe_allow_html=True)
+if performance_mode:
+    st.markdown(PERFORMANCE_CSS, unsafe_allow_html=True)
+else:
+    st.markdown(build_particles_html(), unsafe_allow_html=True)
 
 # ---------------- HEADER ----------------
 st.markdown(
@@ -629,7 +190,12 @@ st.markdown(
 st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
 st.markdown("<div class='section-header'>📋 PATIENT BIOMETRIC INPUT</div>", unsafe_allow_html=True)
 
-col1, col2, col3 = st.columns(3)
+# Inputs are batched in a form so the script reruns once per submission;
+# live preview drops the form and throttles re-scoring instead
+input_panel = st.container() if live_preview else st.form("patient_input")
+
+with input_panel:
+    col1, col2, col3 = st.columns(3)
 
 with col1:
     st.markdown("#### 📊 Vital Parameters")
@@ -641,95 +207,121 @@ with col1:
 
 with col2:
     st.markdown("#### 🧬 Clinical Data")
-    sex_label = st.selectbox("⚧ Biological Sex", ["Male", "Female"])
-    cp_label = st.selectbox(
-        "💢 Chest Pain Type",
-        ["Typical Angina", "Atypical Angina", "Non-Anginal Pain", "Asymptomatic"]
-    )
-    fbs_label = st.selectbox("🍬 Fasting Blood Sugar > 120 mg/dl", ["No", "Yes"])
-    restecg_label = st.selectbox(
-        "📈 Resting ECG",
-        ["Normal", "ST-T Wave Abnormality", "Left Ventricular Hypertrophy"]
-    )
-    exang_label = st.selectbox("🏃 Exercise Induced Angina", ["No", "Yes"])
+    sex_label = st.selectbox("⚧ Biological Sex", list(SEX_MAP))
+    cp_label = st.selectbox("💢 Chest Pain Type", list(CP_MAP))
+    fbs_label = st.selectbox("🍬 Fasting Blood Sugar > 120 mg/dl", list(YES_NO_MAP))
+    restecg_label = st.selectbox("📈 Resting ECG", list(RESTECG_MAP))
+    exang_label = st.selectbox("🏃 Exercise Induced Angina", list(YES_NO_MAP))
 
 with col3:
     st.markdown("#### 🔬 Advanced Metrics")
-    slope_label = st.selectbox(
-        "📊 ST Segment Slope",
-        ["Upsloping", "Flat", "Downsloping"]
-    )
-    ca_label = st.selectbox(
-        "🫀 Major Vessels (Fluoroscopy)",
-        ["No major vessels", "One major vessel", "Two major vessels", 
-         "Three major vessels", "Four major vessels"]
-    )
-    thal_label = st.selectbox(
-        "🧬 Thalassemia Status",
-        ["Normal", "Fixed Defect", "Reversible Defect"]
-    )
+    slope_label = st.selectbox("📊 ST Segment Slope", list(SLOPE_MAP))
+    ca_label = st.selectbox("🫀 Major Vessels (Fluoroscopy)", list(CA_MAP))
+    thal_label = st.selectbox("🧬 Thalassemia Status", list(THAL_MAP))
+
+if live_preview:
+    # Wait out the throttle window first: a newer input change stops this run
+    # at its next Streamlit call, so only the latest values get scored
+    throttle_delay = 1 / preview_rate - (time.monotonic() - st.session_state.get("last_preview", 0.0))
+    if throttle_delay > 0:
+        time.sleep(throttle_delay)
+    st.session_state.last_preview = time.monotonic()
+    run_scan = True
+else:
+    with input_panel:
+        run_scan = st.form_submit_button("⚡ ACTIVATE DEEP NEURAL SCAN")
 
 st.markdown("</div>", unsafe_allow_html=True)
 
-# ---------------- VALUE MAPPING ----------------
-sex = 1 if sex_label == "Male" else 0
-fbs = 1 if fbs_label == "Yes" else 0
-exang = 1 if exang_label == "Yes" else 0
+# ---------------- DEFERRED IMPORTS ----------------
+# pandas and the modules built on it load once the page shell is on screen
+import pandas as pd
 
-cp_map = {"Typical Angina": 0, "Atypical Angina": 1, "Non-Anginal Pain": 2, "Asymptomatic": 3}
-cp = cp_map[cp_label]
+import batch
+import dashboard
+import export
+import history
 
-restecg_map = {"Normal": 0, "ST-T Wave Abnormality": 1, "Left Ventricular Hypertrophy": 2}
-restecg = restecg_map[restecg_label]
+@st.cache_resource
+def load_history(path=history.DEFAULT_PATH):
+    # One batched writer per process, shared by every session
+    return history.HistoryStore(path)
 
-slope_map = {"Upsloping": 0, "Flat": 1, "Downsloping": 2}
-slope = slope_map[slope_label]
+assessments = load_history()
 
-ca_map = {"No major vessels": 0, "One major vessel": 1, "Two major vessels": 2,
-          "Three major vessels": 3, "Four major vessels": 4}
-ca = ca_map[ca_label]
+# ---------------- VALUE MAPPING ----------------
+mapping_start = time.perf_counter()
+input_data = encode_patient(age, sex_label, cp_label, trestbps, chol, fbs_label,
+                            restecg_label, thalach, exang_label, oldpeak,
+                            slope_label, ca_label, thal_label)
+perf.record("input_mapping", time.perf_counter() - mapping_start)
 
-thal_map = {"Normal": 1, "Fixed Defect": 2, "Reversible Defect": 3}
-thal = thal_map[thal_label]
+# ---------------- MODEL READINESS ----------------
+if not model_loader.done():
+    with st.spinner("⏳ Warming up the neural diagnostic engine..."):
+        wait([model_loader])
+try:
+    engine, training_patients = model_loader.result()
+except Exception as e:
+    start_model_loading.clear()  # retry on the next rerun
+    st.error(f"❌ Model failed to load: {type(e).__name__}: {e}")
+    st.stop()
+status_slot.metric("Status", "✅ Active")
 
 # ---------------- PREDICTION SECTION ----------------
 st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
 st.markdown("<div class='section-header'>🔮 NEURAL DIAGNOSTIC ANALYSIS</div>", unsafe_allow_html=True)
 
-if st.button("⚡ ACTIVATE DEEP NEURAL SCAN"):
-    input_data = np.array([[age, sex, cp, trestbps, chol, fbs, restecg,
-                            thalach, exang, oldpeak, slope, ca, thal]])
-    
-    input_scaled = scaler.transform(input_data)
-    
-    # Progress animation
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    import time
-    for i in range(100):
-        progress_bar.progress(i + 1)
-        if i < 30:
-            status_text.text("🧠 Initializing neural network...")
-        elif i < 60:
-            status_text.text("🔍 Processing biometric data...")
-        elif i < 90:
-            status_text.text("⚡ Running KNN algorithm...")
-        else:
-            status_text.text("✅ Analysis complete!")
-        time.sleep(0.02)
-    
-    progress_bar.empty()
-    status_text.empty()
-    
-    prediction = model.predict(input_scaled)[0]
-    
-    # Get prediction probability if available
+STAGE_LABELS = {
+    "lookup": "📇 Served from precomputed lookup table",
+    "cache": "💾 Served from prediction cache",
+    "queue_wait": "⏳ Waiting for the shared batch window",
+    "scaling": "🔍 Scaling biometric data",
+    "neighbor_search": "⚡ Searching nearest neighbors",
+    "probability": "🧠 Computing risk probability",
+    "rendering": "✅ Rendering diagnostic dashboard",
+}
+
+if run_scan:
+    # Progress tracks the real pipeline stages with their measured timings
+    stage_times = {}
+    progress_bar = st.progress(0) if show_progress else None
+    
+    def track_stage(stage, seconds):
+        stage_times[stage] = seconds
+        perf.record(stage, seconds)
+        if progress_bar is not None:
+            done = len(stage_times) * 100 // len(STAGE_LABELS)
+            progress_bar.progress(done, text=f"{STAGE_LABELS[stage]} • {seconds * 1000:.2f} ms")
+    
+    # One neighbor search yields the class, probability and distances; a
+    # failure is reported as such instead of showing a made-up confidence
     try:
-        proba = model.predict_proba(input_scaled)[0]
-        confidence = max(proba) * 100
-    except:
-        confidence = 85  # Default confidence
+        result = engine.score_one(input_data, on_stage=track_stage)
+    except Exception as e:
+        st.error(f"❌ Neural scan failed: {type(e).__name__}: {e}")
+        with st.expander("Error details"):
+            st.exception(e)
+        run_scan = False
+
+if run_scan:
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Only submitted scans are stored; live preview would log every keystroke
+    if not live_preview:
+        assessments.append({
+            "timestamp": timestamp,
+            **dict(zip(FEATURE_COLUMNS, input_data.tolist())),
+            "prediction": result.prediction,
+            "probability": result.probability,
+            "confidence": result.confidence,
+            "risk_level": result.risk_level,
+            "model_version": engine.metadata.get("version", "unversioned"),
+            "latency_ms": sum(stage_times.values()) * 1000,
+        })
+    render_start = time.perf_counter()
+    section_watch = perf.stopwatch()
+    prediction = result.prediction
+    confidence = result.confidence
     
     st.markdown("<div class='result-container'>", unsafe_allow_html=True)
     
@@ -818,9 +410,24 @@ if st.button("⚡ ACTIVATE DEEP NEURAL SCAN"):
         risk_color = "#00ff7f"
     
     st.markdown("</div>", unsafe_allow_html=True)
+    if result.neighbor_distances:
+        st.caption(
+            f"Probability of heart disease: {result.probability:.1%} • "
+            f"{len(result.neighbor_distances)} nearest patients at distance "
+            f"{result.neighbor_distances[0]:.2f}–{result.neighbor_distances[-1]:.2f}"
+        )
+    else:
+        st.caption(f"Probability of heart disease: {result.probability:.1%}")
+    section_watch.lap("section_result")
+    
+    # Reference frames are built once per process; this patient's values in one pass
+    patient_metrics = dashboard.patient_metrics(input_data[None, :])
+    patient = patient_metrics.iloc[0]
     
     # ---------------- DATA VISUALIZATIONS ----------------
     if show_charts:
+        chart_data, risk_factors, trend_data = dashboard.patient_frames(patient_metrics)
+
         st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
         st.markdown("<div class='section-header'>📊 DATA VISUALIZATION DASHBOARD</div>", unsafe_allow_html=True)
         
@@ -829,41 +436,19 @@ if st.button("⚡ ACTIVATE DEEP NEURAL SCAN"):
         with viz_col1:
             # Parameter comparison chart
             st.markdown("#### 📈 Your Values vs Normal Range")
-            
-            chart_data = pd.DataFrame({
-                'Your Values': [age, trestbps, chol/3, thalach, oldpeak*20],
-                'Normal Range': [50, 120, 200/3, 150, 20]
-            }, index=['Age', 'BP', 'Cholesterol', 'Max HR', 'ST Depression'])
-            
             st.bar_chart(chart_data, color=["#00f5ff", "#00ff7f"])
         
         with viz_col2:
             # Risk factors chart
             st.markdown("#### ⚠️ Risk Factor Distribution")
-            
-            risk_factors = pd.DataFrame({
-                'Intensity': [
-                    (age - 20) / 80 * 100,
-                    (trestbps - 80) / 120 * 100,
-                    (chol - 100) / 500 * 100,
-                    (thalach - 60) / 160 * 100,
-                    oldpeak / 6 * 100
-                ]
-            }, index=['Age Risk', 'BP Risk', 'Cholesterol Risk', 'HR Risk', 'ST Risk'])
-            
             st.bar_chart(risk_factors, color="#ff00ff")
         
         # Line chart showing trends
         st.markdown("#### 📉 Health Metrics Trend Analysis")
-        trend_data = pd.DataFrame({
-            'Blood Pressure': [trestbps, 120, 110, 115],
-            'Cholesterol': [chol, 200, 190, 195],
-            'Heart Rate': [thalach, 150, 145, 148]
-        }, index=['Current', 'Target', 'Optimal', 'Healthy'])
-        
         st.line_chart(trend_data, color=["#ff4444", "#ffaa00", "#00ff7f"])
         
         st.markdown("</div>", unsafe_allow_html=True)
+        section_watch.lap("section_charts")
     
     # ---------------- STATISTICS DASHBOARD ----------------
     if show_stats:
@@ -873,32 +458,26 @@ if st.button("⚡ ACTIVATE DEEP NEURAL SCAN"):
         metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
         
         with metric_col1:
-            bp_status = "Normal" if 90 <= trestbps <= 130 else ("High" if trestbps > 130 else "Low")
-            bp_delta = trestbps - 120
             st.metric(
                 label="🩺 Blood Pressure",
                 value=f"{trestbps} mmHg",
-                delta=f"{bp_delta:+d} from normal",
+                delta=f"{patient['bp_delta']:+.0f} from normal ({patient['bp_status']})",
                 delta_color="inverse"
             )
         
         with metric_col2:
-            chol_status = "Normal" if chol < 200 else ("Borderline" if chol < 240 else "High")
-            chol_delta = chol - 200
             st.metric(
                 label="🧪 Cholesterol",
                 value=f"{chol} mg/dl",
-                delta=f"{chol_delta:+d} from optimal",
+                delta=f"{patient['chol_delta']:+.0f} from optimal ({patient['chol_status']})",
                 delta_color="inverse"
             )
         
         with metric_col3:
-            hr_status = "Normal" if 60 <= thalach <= 100 else "Elevated"
-            hr_delta = thalach - 150
             st.metric(
                 label="💓 Max Heart Rate",
                 value=f"{thalach} bpm",
-                delta=f"{hr_delta:+d} from avg"
+                delta=f"{patient['hr_delta']:+.0f} from avg"
             )
         
         with metric_col4:
@@ -909,6 +488,41 @@ if st.button("⚡ ACTIVATE DEEP NEURAL SCAN"):
             )
         
         st.markdown("</div>", unsafe_allow_html=True)
+        section_watch.lap("section_stats")
+    
+    # ---------------- NEIGHBOR EVIDENCE ----------------
+    if show_neighbors:
+        st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+        st.markdown("<div class='section-header'>🔎 NEAREST PATIENT EVIDENCE</div>", unsafe_allow_html=True)
+        
+        # Built from the neighbors found while scoring, not a second search
+        neighbors = engine.explain(input_data, result, training_patients)
+        high_risk_neighbors = int((neighbors["target"] == 1).sum())
+        st.markdown(
+            f"**{high_risk_neighbors} of the {len(neighbors)} most similar patients** in the "
+            "training data were diagnosed with heart disease."
+        )
+        
+        evidence_col1, evidence_col2 = st.columns(2)
+        
+        with evidence_col1:
+            st.markdown("#### 🧑‍🤝‍🧑 Most Similar Patients")
+            evidence = neighbors[(["patient"] if "patient" in neighbors else [])
+                                 + ["distance", "target", "age", "sex", "trestbps", "chol", "thalach", "oldpeak"]]
+            st.dataframe(
+                evidence.assign(target=np.where(evidence["target"] == 1, "Disease", "No disease")).round(3),
+                width="stretch"
+            )
+        
+        with evidence_col2:
+            # Each bar is one neighbor's squared distance split by feature
+            st.markdown("#### 🧮 What Separates You From Each Neighbor (%)")
+            contributions = neighbors.filter(like="contribution_")
+            contributions.columns = [c.removeprefix("contribution_") for c in contributions.columns]
+            st.bar_chart(contributions)
+        
+        st.markdown("</div>", unsafe_allow_html=True)
+        section_watch.lap("section_neighbors")
     
     # ---------------- HEALTH RECOMMENDATIONS ----------------
     if show_recommendations:
@@ -954,13 +568,12 @@ if st.button("⚡ ACTIVATE DEEP NEURAL SCAN"):
             """)
         
         st.markdown("</div>", unsafe_allow_html=True)
+        section_watch.lap("section_recommendations")
     
     # ---------------- REPORT SUMMARY ----------------
     st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
     st.markdown("<div class='section-header'>📄 DIAGNOSTIC REPORT SUMMARY</div>", unsafe_allow_html=True)
     
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
     report_data = {
         "Parameter": ["Age", "Sex", "Chest Pain Type", "Resting BP", "Cholesterol", 
                      "Fasting Blood Sugar", "Resting ECG", "Max Heart Rate",
@@ -989,10 +602,164 @@ if st.button("⚡ ACTIVATE DEEP NEURAL SCAN"):
     for informational and educational purposes only.
     """)
     
+    report_export = pd.concat([
+        report_df[["Parameter", "Value"]],
+        pd.DataFrame({
+            "Parameter": ["Analysis Timestamp", "Prediction", "Confidence Level", "Model Version"],
+            "Value": [timestamp, f"{risk_level} RISK", f"{confidence:.1f}%",
+                      engine.metadata.get("version", "unversioned")],
+        }),
+    ], ignore_index=True)
+    
+    # Files are generated only when a button is clicked, without a rerun
+    export_cols = st.columns(len(export.FORMATS))
+    for export_col, (fmt, (mime, extension)) in zip(export_cols, export.FORMATS.items()):
+        with export_col:
+            st.download_button(
+                f"⬇️ Report ({fmt.upper()})",
+                data=lambda fmt=fmt: export.spool(export.stream(
+                    [report_export], fmt, title=f"Cardiac Risk Report • {timestamp}"
+                )),
+                file_name=f"cardiac_report_{timestamp.replace(' ', '_').replace(':', '')}.{extension}",
+                mime=mime,
+                on_click="ignore"
+            )
+    
     st.markdown("</div>", unsafe_allow_html=True)
+    section_watch.lap("section_report")
+    
+    track_stage("rendering", time.perf_counter() - render_start)
+    if progress_bar is not None:
+        progress_bar.progress(100, text=" • ".join(
+            f"{STAGE_LABELS[stage]}: {seconds * 1000:.2f} ms" for stage, seconds in stage_times.items()
+        ))
 
 st.markdown("</div>", unsafe_allow_html=True)
 
+cache_hits_slot.metric("Cache Hits", engine.cache.hits)
+cache_misses_slot.metric("Cache Misses", engine.cache.misses)
+
+# ---------------- PERFORMANCE PANEL ----------------
+if performance_slot is not None:
+    with performance_slot:
+        st.markdown("### ⏱️ PERFORMANCE")
+        summary = perf.summary()
+        if summary:
+            st.dataframe(
+                pd.DataFrame.from_dict(summary, orient="index").round(3),
+                width="stretch"
+            )
+        st.download_button(
+            "⬇️ Prometheus Metrics",
+            data=perf.to_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
+
+# ---------------- BATCH COHORT SCORING ----------------
+st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+st.markdown("<div class='section-header'>📂 BATCH COHORT SCORING</div>", unsafe_allow_html=True)
+
+cohort_file = st.file_uploader(
+    "Upload a cohort CSV (heart.csv column layout)",
+    type="csv",
+    help="Every row is scored in vectorized chunks; extra columns are passed through"
+)
+
+cohort_format = st.selectbox("Export Format", list(export.FORMATS), key="cohort_format")
+
+if cohort_file is not None and st.button("⚡ SCORE COHORT"):
+    cohort_summary = dashboard.CohortSummary()
+    # Each scored chunk is aggregated, encoded and spilled to disk before the next is read
+    scored_chunks = (cohort_summary.add(chunk) for chunk in batch.iter_scored_chunks(cohort_file, engine))
+    try:
+        scored_file = export.spool(export.stream(scored_chunks, cohort_format))
+    except (ValueError, RuntimeError) as e:
+        st.error(f"❌ {e}")
+    else:
+        mime, extension = export.FORMATS[cohort_format]
+        st.success(f"✅ Scored {cohort_summary.rows} patients")
+        st.download_button(
+            "⬇️ Download Scored Cohort",
+            data=scored_file,
+            file_name=f"scored_{os.path.splitext(cohort_file.name)[0]}.{extension}",
+            mime=mime
+        )
+        
+        # Aggregates were folded in chunk by chunk while scoring
+        cohort_chart, cohort_risk_factors, cohort_status, cohort_risk = cohort_summary.frames()
+        cohort_col1, cohort_col2, cohort_col3 = st.columns(3)
+        with cohort_col1:
+            st.markdown("#### 📈 Cohort Average vs Normal Range")
+            st.bar_chart(cohort_chart, color=["#00f5ff", "#00ff7f"])
+        with cohort_col2:
+            st.markdown("#### ⚠️ Average Risk Factor Intensity")
+            st.bar_chart(cohort_risk_factors, color="#ff00ff")
+        with cohort_col3:
+            st.markdown("#### 🎯 Risk Levels")
+            st.bar_chart(cohort_risk)
+        st.markdown("#### 🩺 Vital Status Distribution")
+        st.dataframe(cohort_status, width="stretch")
+
+st.markdown("</div>", unsafe_allow_html=True)
+
+# ---------------- ASSESSMENT HISTORY ----------------
+if show_history:
+    st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+    st.markdown("<div class='section-header'>🗂️ ASSESSMENT HISTORY</div>", unsafe_allow_html=True)
+    
+    filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+    with filter_col1:
+        history_risk = st.selectbox("Risk Level", ["All", "HIGH", "LOW"])
+    with filter_col2:
+        history_dates = st.date_input("Date Range", value=())
+    with filter_col3:
+        history_page_size = st.selectbox("Rows per Page", [25, 50, 100, 250], index=1)
+    with filter_col4:
+        history_format = st.selectbox("Export Format", list(export.FORMATS), key="history_format")
+    
+    history_filters = {
+        "risk_level": None if history_risk == "All" else history_risk,
+        "since": str(history_dates[0]) if len(history_dates) > 0 else None,
+        # date_input bounds are inclusive; the store's upper bound is not
+        "until": str(history_dates[-1] + timedelta(days=1)) if len(history_dates) > 1 else None,
+    }
+    # Keyset cursors of the pages visited so far; reset when the filters change
+    history_key = (tuple(history_filters.values()), history_page_size)
+    if st.session_state.get("history_key") != history_key:
+        st.session_state.history_key = history_key
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    
+    page_rows, next_cursor = assessments.page(limit=history_page_size, after=cursors[-1],
+                                              **history_filters)
+    st.caption(f"{assessments.count(**history_filters)} assessments • page {len(cursors)}")
+    st.dataframe(page_rows, width="stretch")
+    
+    nav_col1, nav_col2, nav_col3 = st.columns(3)
+    with nav_col1:
+        if st.button("⬅️ Newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with nav_col2:
+        if st.button("Older ➡️", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    with nav_col3:
+        # Every matching row, read page by page when the button is clicked
+        st.download_button(
+            "⬇️ Export History",
+            data=lambda: export.spool(export.stream(
+                assessments.iter_pages(**history_filters), history_format, index=True,
+                empty=history.empty_frame()
+            )),
+            file_name=f"assessment_history.{export.FORMATS[history_format][1]}",
+            mime=export.FORMATS[history_format][0],
+            on_click="ignore"
+        )
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+
 # ---------------- FOOTER ----------------
 st.markdown(
     """
@@ -0,0 +1,116 @@
+"""Batch cohort scoring for CSV files in the ``heart.csv`` column layout.
+
+Rows are read, scaled and scored in fixed-size chunks so a cohort of any
+size can be scored with bounded memory.  Used by the Streamlit upload panel
+and as a command line tool::
+
+    python batch.py cohort.csv -o scored.csv --chunksize 50000
+
+With ``--workers N`` chunks are scored across a process pool.  Workers
+memory-map one ``.knnz`` model file (exported on the fly from the pickles if
+needed) instead of each unpickling a copy, and results are written in input
+order with at most ``2 * N`` chunks in flight.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+from collections import deque
+
+import pandas as pd
+
+from engine import RiskEngine, load_artifacts, load_metadata
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def iter_scored_chunks(source, engine, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield scored DataFrames, one per ``chunksize`` rows of ``source``."""
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        yield engine.score_frame(chunk)
+
+
+def write_scored_csv(source, dest, engine, chunksize=DEFAULT_CHUNKSIZE):
+    """Score ``source`` chunk by chunk into ``dest``; return the row count."""
+    rows = 0
+    for i, scored in enumerate(iter_scored_chunks(source, engine, chunksize)):
+        scored.to_csv(dest, header=(i == 0), index=False)
+        rows += len(scored)
+    return rows
+
+
+_worker_engine = None
+
+
+def _init_worker(model_path):
+    global _worker_engine
+    # The parent already verified (or just wrote) the file
+    _worker_engine = RiskEngine.open(model_path, verify=False)
+
+
+def _score_csv_text(chunk, header):
+    return _worker_engine.score_frame(chunk).to_csv(header=header, index=False)
+
+
+def parallel_write_scored_csv(source, dest, model_path="knn_heart_model.pkl",
+                              scaler_path="scaler.pkl", workers=None,
+                              chunksize=DEFAULT_CHUNKSIZE):
+    """Score ``source`` into ``dest`` across a process pool; return the row count."""
+    workers = workers or os.cpu_count()
+    with tempfile.TemporaryDirectory() as tmp:
+        if model_path.endswith(".knnz"):
+            RiskEngine.open(model_path)  # verify the checksum once, up front
+        else:
+            from modelfile import export_model  # pulls in scikit-learn; only needed here
+            shared_path = os.path.join(tmp, "model.knnz")
+            model, scaler = load_artifacts(model_path, scaler_path)
+            export_model(model, scaler, shared_path, load_metadata(model_path))
+            model_path = shared_path
+
+        rows = 0
+        pending = deque()
+        with multiprocessing.Pool(workers, _init_worker, (model_path,)) as pool:
+            for i, chunk in enumerate(pd.read_csv(source, chunksize=chunksize)):
+                pending.append((len(chunk), pool.apply_async(_score_csv_text, (chunk, i == 0))))
+                if len(pending) >= 2 * workers:
+                    n, result = pending.popleft()
+                    dest.write(result.get())
+                    rows += n
+            while pending:
+                n, result = pending.popleft()
+                dest.write(result.get())
+                rows += n
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a patient cohort CSV.")
+    parser.add_argument("input", help="CSV file with the heart.csv columns")
+    parser.add_argument("-o", "--output", help="output CSV (default: stdout)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="rows scored per vectorized chunk")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="scoring processes (0 = one per CPU)")
+    parser.add_argument("--model", default="knn_heart_model.pkl",
+                        help="pickled model or .knnz model file")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    args = parser.parse_args(argv)
+
+    def score(dest):
+        if args.workers == 1:
+            engine = RiskEngine.load(args.model, args.scaler)
+            return write_scored_csv(args.input, dest, engine, args.chunksize)
+        return parallel_write_scored_csv(args.input, dest, args.model, args.scaler,
+                                         args.workers or None, args.chunksize)
+
+    if args.output:
+        with open(args.output, "w", newline="") as dest:
+            rows = score(dest)
+        print(f"Scored {rows} patients -> {args.output}", file=sys.stderr)
+    else:
+        score(sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
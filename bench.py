@@ -0,0 +1,203 @@
+"""Latency benchmark for the inference path.
+
+Measures model load time, ``scaler.transform`` throughput and ``predict`` /
+``predict_proba`` / ``RiskEngine.score_batch`` latency percentiles on
+synthetic ``heart.csv``-shaped data, and writes the results to JSON.  The
+engine's fused NumPy kernel is compared against the two-call
+``scaler.transform`` + ``predict_proba`` path, and its predictions are checked
+for parity with the pickled model (any mismatch makes the exit status 1)::
+
+    python bench.py -o bench.json
+    python bench.py --sizes 1 100 -o new.json --compare bench.json
+    python bench.py --model knn_heart_model.knnz
+
+``cold_load_ms`` times importing the engine and loading the model in fresh
+interpreters, i.e. a real cold start; for a ``.knnz`` model the pickles are
+timed next to it.  A ``.knnz`` model carries no scikit-learn estimators, so
+the sklearn-only metrics and the parity check are skipped for it
+(``parity.py`` covers the ``.knnz`` path).
+
+With ``--compare`` any p50 latency that grew by more than ``--tolerance``
+relative to the baseline file is reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from engine import FEATURE_COLUMNS, RiskEngine, load_artifacts
+from lookup import file_sha256
+
+DEFAULT_SIZES = (1, 100, 10_000, 1_000_000)
+
+# Run in a fresh interpreter: seconds to import the engine and load the model
+COLD_LOAD_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+from engine import RiskEngine
+RiskEngine.load(sys.argv[1], sys.argv[2])
+print(time.perf_counter() - start)
+"""
+
+
+def synthetic_frame(n_rows, data_path="heart.csv", seed=0):
+    """Draw ``n_rows`` patients by sampling each column's observed values."""
+    source = pd.read_csv(data_path)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({c: rng.choice(source[c].to_numpy(), n_rows) for c in FEATURE_COLUMNS})
+
+
+def percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {"p50": float(np.percentile(ms, 50)), "p95": float(np.percentile(ms, 95)),
+            "p99": float(np.percentile(ms, 99)), "mean": float(ms.mean()), "runs": len(ms)}
+
+
+def time_calls(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def repeats_for(n_rows):
+    return max(3, min(200, 100_000 // n_rows))
+
+
+def cold_load_samples(model_path, scaler_path, repeats=5):
+    """Seconds to import the engine and load the model, each in a new process."""
+    samples = []
+    for _ in range(repeats):
+        proc = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", COLD_LOAD_SCRIPT,
+             os.path.abspath(model_path), os.path.abspath(scaler_path)],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append(float(proc.stdout.split()[-1]))
+    return samples
+
+
+def run(model_path="knn_heart_model.pkl", scaler_path="scaler.pkl",
+        sizes=DEFAULT_SIZES, load_repeats=20, cold_repeats=5,
+        pickle_path="knn_heart_model.pkl"):
+    knnz = model_path.endswith(".knnz")
+    load = (lambda: RiskEngine.open(model_path)) if knnz else (
+        lambda: load_artifacts(model_path, scaler_path))
+    cold_paths = [model_path] + ([pickle_path] if knnz and os.path.exists(pickle_path) else [])
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "model_sha256": file_sha256(model_path),
+        },
+        "load_ms": percentiles(time_calls(load, load_repeats)),
+        "cold_load_ms": {os.path.basename(path): percentiles(
+            cold_load_samples(path, scaler_path, cold_repeats)) for path in cold_paths},
+        "sizes": {},
+    }
+
+    engine = RiskEngine.load(model_path, scaler_path)
+    results["meta"]["model_metadata"] = engine.metadata
+    model, scaler = engine.model, engine.scaler
+    # Mapped .knnz models are plain arrays, not scikit-learn estimators
+    sklearn_estimators = isinstance(model, sklearn.base.BaseEstimator)
+
+    for n_rows in sizes:
+        frame = synthetic_frame(n_rows)
+        X = frame.to_numpy(dtype=float)
+        repeats = repeats_for(n_rows)
+        metrics = {
+            "score_batch_ms": percentiles(time_calls(lambda: engine.score_batch(X), repeats)),
+            "fused_kernel": engine.kernel is not None,
+            "parity_mismatches": None,
+        }
+        if sklearn_estimators:
+            scaled = scaler.transform(frame)
+            transform = percentiles(time_calls(lambda: scaler.transform(frame), repeats))
+            expected = model.predict(scaled)
+            fused = engine.score_batch(X)
+            metrics.update({
+                "transform_ms": transform,
+                "transform_rows_per_s": n_rows / (transform["p50"] / 1000),
+                "predict_ms": percentiles(time_calls(lambda: model.predict(scaled), repeats)),
+                "predict_proba_ms": percentiles(time_calls(lambda: model.predict_proba(scaled),
+                                                           repeats)),
+                "two_call_ms": percentiles(time_calls(
+                    lambda: model.predict_proba(scaler.transform(frame)), repeats)),
+                "parity_mismatches": int((fused.prediction != expected).sum()),
+            })
+        results["sizes"][str(n_rows)] = metrics
+        print(f"{n_rows:>9} rows: score_batch p50 "
+              f"{results['sizes'][str(n_rows)]['score_batch_ms']['p50']:.3f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Return (metric, baseline p50, new p50) for every p50 that regressed."""
+    regressions = []
+    pairs = [("load_ms", results["load_ms"], baseline.get("load_ms"))]
+    for name, value in results["cold_load_ms"].items():
+        pairs.append((f"cold_load_ms/{name}", value, baseline.get("cold_load_ms", {}).get(name)))
+    for size, metrics in results["sizes"].items():
+        for name, value in metrics.items():
+            if isinstance(value, dict):
+                old = baseline.get("sizes", {}).get(size, {}).get(name)
+                pairs.append((f"{size}/{name}", value, old))
+
+    for name, new, old in pairs:
+        if old is not None and new["p50"] > old["p50"] * (1 + tolerance):
+            regressions.append((name, old["p50"], new["p50"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the inference path.")
+    parser.add_argument("-o", "--output", default="bench.json")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--model", default="knn_heart_model.pkl")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--cold-repeats", type=int, default=5,
+                        help="fresh-interpreter model loads timed for cold_load_ms")
+    parser.add_argument("--compare", metavar="BASELINE_JSON",
+                        help="fail if p50 latencies regressed against this result file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative p50 slowdown for --compare")
+    args = parser.parse_args(argv)
+
+    results = run(args.model, args.scaler, args.sizes, cold_repeats=args.cold_repeats)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    failed = False
+    for size, metrics in results["sizes"].items():
+        if metrics["parity_mismatches"]:
+            print(f"PARITY {size} rows: {metrics['parity_mismatches']} predictions differ "
+                  "from the pickled model", file=sys.stderr)
+            failed = True
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: p50 {old:.3f} ms -> {new:.3f} ms", file=sys.stderr)
+        failed = failed or bool(regressions)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
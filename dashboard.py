@@ -0,0 +1,108 @@
+"""Dashboard data preparation for one patient or a whole cohort.
+
+The reference values behind the visualization and statistics sections are
+constant, so their frames are built once per process.  Per-patient values
+(display-scaled vitals, risk-factor intensities, deltas and status labels)
+come from one vectorized pass over an ``(n, 13)`` feature array, which lets
+the same code drive the single-patient dashboard and aggregate dashboards
+over scored cohorts of any size.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from engine import FEATURE_COLUMNS
+
+# Vitals charted against normal values; cholesterol and ST depression are
+# rescaled so all five share one axis
+COMPARISON_INDEX = ["Age", "BP", "Cholesterol", "Max HR", "ST Depression"]
+COMPARISON_COLUMNS = ["age", "trestbps", "chol", "thalach", "oldpeak"]
+COMPARISON_SCALE = np.array([1, 1, 1 / 3, 1, 20])
+NORMAL_VALUES = np.array([50, 120, 200 / 3, 150, 20])
+
+# Risk-factor intensity: position of each vital within its input range, in percent
+RISK_FACTOR_INDEX = ["Age Risk", "BP Risk", "Cholesterol Risk", "HR Risk", "ST Risk"]
+RISK_FACTOR_LOW = np.array([20, 80, 100, 60, 0])
+RISK_FACTOR_SPAN = np.array([80, 120, 500, 160, 6])
+
+TREND_INDEX = ["Current", "Target", "Optimal", "Healthy"]
+TREND_COLUMNS = {"Blood Pressure": "trestbps", "Cholesterol": "chol", "Heart Rate": "thalach"}
+TREND_REFERENCE = [[120, 200, 150], [110, 190, 145], [115, 195, 148]]
+
+STATUS_COLUMNS = ["bp_status", "chol_status", "hr_status"]
+
+
+@lru_cache(maxsize=None)
+def reference_frames():
+    """The constant ``(normal range, trend reference)`` frames, built once."""
+    normal = pd.DataFrame({"Normal Range": NORMAL_VALUES}, index=COMPARISON_INDEX)
+    trend = pd.DataFrame(TREND_REFERENCE, columns=list(TREND_COLUMNS), index=TREND_INDEX[1:])
+    return normal, trend
+
+
+def patient_metrics(X):
+    """Dashboard values for every row of an ``(n, 13)`` raw feature array or frame."""
+    if isinstance(X, pd.DataFrame):
+        X = X[FEATURE_COLUMNS].to_numpy(dtype=float)
+    X = np.asarray(X, dtype=float)
+    vitals = X[:, [FEATURE_COLUMNS.index(c) for c in COMPARISON_COLUMNS]]
+    trestbps, chol, thalach = vitals[:, 1], vitals[:, 2], vitals[:, 3]
+
+    metrics = pd.DataFrame(vitals * COMPARISON_SCALE, columns=COMPARISON_INDEX)
+    metrics[COMPARISON_COLUMNS] = vitals
+    metrics[RISK_FACTOR_INDEX] = (vitals - RISK_FACTOR_LOW) / RISK_FACTOR_SPAN * 100
+    metrics["bp_delta"] = trestbps - 120
+    metrics["chol_delta"] = chol - 200
+    metrics["hr_delta"] = thalach - 150
+    metrics["bp_status"] = np.select([trestbps > 130, trestbps >= 90], ["High", "Normal"], "Low")
+    metrics["chol_status"] = np.select([chol < 200, chol < 240], ["Normal", "Borderline"], "High")
+    metrics["hr_status"] = np.where((thalach >= 60) & (thalach <= 100), "Normal", "Elevated")
+    return metrics
+
+
+def patient_frames(metrics, row=0):
+    """``(chart_data, risk_factors, trend_data)`` for one patient of ``patient_metrics``."""
+    normal, trend = reference_frames()
+    patient = metrics.iloc[row]
+    chart_data = normal.copy()
+    chart_data.insert(0, "Your Values", patient[COMPARISON_INDEX].to_numpy(dtype=float))
+    risk_factors = pd.DataFrame({"Intensity": patient[RISK_FACTOR_INDEX].to_numpy(dtype=float)},
+                                index=RISK_FACTOR_INDEX)
+    current = pd.DataFrame([patient[list(TREND_COLUMNS.values())].to_numpy(dtype=float)],
+                           columns=list(TREND_COLUMNS), index=TREND_INDEX[:1])
+    return chart_data, risk_factors, pd.concat([current, trend])
+
+
+class CohortSummary:
+    """Running aggregates of ``patient_metrics`` over scored chunks of a cohort."""
+
+    def __init__(self):
+        self.rows = 0
+        self._sums = pd.Series(0.0, index=COMPARISON_INDEX + RISK_FACTOR_INDEX)
+        self._status_counts = pd.DataFrame(dtype=int)
+        self._risk_counts = pd.Series(dtype=int)
+
+    def add(self, scored):
+        """Fold in one frame with the feature columns (and ``risk_level``, if scored)."""
+        metrics = patient_metrics(scored)
+        self.rows += len(metrics)
+        self._sums += metrics[self._sums.index].sum()
+        counts = metrics[STATUS_COLUMNS].apply(pd.Series.value_counts)
+        self._status_counts = self._status_counts.add(counts, fill_value=0)
+        if "risk_level" in scored:
+            self._risk_counts = self._risk_counts.add(scored["risk_level"].value_counts(), fill_value=0)
+        return scored
+
+    def frames(self):
+        """``(chart_data, risk_factors, status_counts, risk_counts)`` for the cohort so far."""
+        normal, _ = reference_frames()
+        means = self._sums / max(self.rows, 1)
+        chart_data = normal.copy()
+        chart_data.insert(0, "Cohort Average", means[COMPARISON_INDEX].to_numpy())
+        risk_factors = pd.DataFrame({"Average Intensity": means[RISK_FACTOR_INDEX].to_numpy()},
+                                    index=RISK_FACTOR_INDEX)
+        status_counts = self._status_counts.fillna(0).astype(int).rename(
+            columns={"bp_status": "Blood Pressure", "chol_status": "Cholesterol",
+                     "hr_status": "Max Heart Rate"})
+        return chart_data, risk_factors, status_counts, self._risk_counts.astype(int)
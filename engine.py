@@ -0,0 +1,494 @@
+"""Headless cardiac risk scoring engine.
+
+Holds the UI label -> feature code maps and the scaler + KNN inference path
+so the Streamlit app, the batch scorer and any server process share one
+implementation that can be imported without starting Streamlit.  pandas is
+only imported by the functions that build frames, so the app can render its
+input form (which needs the label maps) before pandas has loaded.
+"""
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+METADATA_FILE = "model_metadata.json"
+
+FEATURE_COLUMNS = ["age", "sex", "cp", "trestbps", "chol", "fbs", "restecg",
+                   "thalach", "exang", "oldpeak", "slope", "ca", "thal"]
+
+# ---------------- LABEL -> CODE MAPS ----------------
+SEX_MAP = {"Male": 1, "Female": 0}
+YES_NO_MAP = {"No": 0, "Yes": 1}
+CP_MAP = {"Typical Angina": 0, "Atypical Angina": 1, "Non-Anginal Pain": 2, "Asymptomatic": 3}
+RESTECG_MAP = {"Normal": 0, "ST-T Wave Abnormality": 1, "Left Ventricular Hypertrophy": 2}
+SLOPE_MAP = {"Upsloping": 0, "Flat": 1, "Downsloping": 2}
+CA_MAP = {"No major vessels": 0, "One major vessel": 1, "Two major vessels": 2,
+          "Three major vessels": 3, "Four major vessels": 4}
+THAL_MAP = {"Normal": 1, "Fixed Defect": 2, "Reversible Defect": 3}
+
+# Categorical features that may be given as UI labels instead of codes
+LABEL_MAPS = {"sex": SEX_MAP, "cp": CP_MAP, "fbs": YES_NO_MAP, "restecg": RESTECG_MAP,
+              "exang": YES_NO_MAP, "slope": SLOPE_MAP, "ca": CA_MAP, "thal": THAL_MAP}
+
+# Inference stages reported to ``on_stage`` callbacks, in execution order
+PIPELINE_STAGES = ("scaling", "neighbor_search", "probability")
+
+
+class RiskScore(NamedTuple):
+    prediction: int
+    probability: float  # probability of the high-risk class
+    confidence: float   # probability of the predicted class, in percent
+    risk_level: str
+    neighbor_distances: tuple  # scaled-space distances to the k nearest training rows
+    neighbor_indices: tuple    # their row positions in the training matrix
+
+
+class BatchScores(NamedTuple):
+    prediction: np.ndarray
+    probability: np.ndarray
+    confidence: np.ndarray
+    neighbor_distances: np.ndarray  # (n, k)
+    neighbor_indices: np.ndarray    # (n, k)
+
+
+def encode_patient(age, sex, cp, trestbps, chol, fbs, restecg,
+                   thalach, exang, oldpeak, slope, ca, thal):
+    """Map UI labels to the 13-feature numeric vector in model column order."""
+    return np.array([
+        age, SEX_MAP[sex], CP_MAP[cp], trestbps, chol, YES_NO_MAP[fbs],
+        RESTECG_MAP[restecg], thalach, YES_NO_MAP[exang], oldpeak,
+        SLOPE_MAP[slope], CA_MAP[ca], THAL_MAP[thal],
+    ], dtype=float)
+
+
+def encode_record(record):
+    """Map a column -> value record to the feature vector.
+
+    Categorical values may be numeric codes or the UI labels used in the app.
+    """
+    missing = [c for c in FEATURE_COLUMNS if c not in record]
+    if missing:
+        raise ValueError(f"missing required feature columns: {', '.join(missing)}")
+
+    values = []
+    for column in FEATURE_COLUMNS:
+        value = record[column]
+        if isinstance(value, str) and column in LABEL_MAPS:
+            if value not in LABEL_MAPS[column]:
+                raise ValueError(f"unknown {column} label: {value!r}")
+            value = LABEL_MAPS[column][value]
+        values.append(value)
+    return np.array(values, dtype=float)
+
+
+def check_features(X):
+    """Return ``X`` as an ``(n, 13)`` float array, or raise ``ValueError``.
+
+    NaN and inf are rejected: the fused kernel would otherwise rank their
+    distances arbitrarily and return a confident score.
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim != 2 or X.shape[1] != len(FEATURE_COLUMNS):
+        raise ValueError(f"expected an (n, {len(FEATURE_COLUMNS)}) feature array, got {X.shape}")
+    finite = np.isfinite(X).all(axis=1)
+    if not finite.all():
+        rows = np.flatnonzero(~finite)
+        raise ValueError(f"feature values must be finite; {len(rows)} row(s) contain "
+                         f"NaN or inf (first at row {rows[0]})")
+    return X
+
+
+def risk_levels(prediction):
+    return np.where(np.asarray(prediction) == 1, "HIGH", "LOW")
+
+
+def as_scores(batch):
+    """Split the ``BatchScores`` returned by ``RiskEngine.score_batch`` into ``RiskScore`` rows."""
+    levels = risk_levels(batch.prediction)
+    return [RiskScore(int(batch.prediction[i]), float(batch.probability[i]),
+                      float(batch.confidence[i]), str(levels[i]),
+                      tuple(batch.neighbor_distances[i].tolist()),
+                      tuple(batch.neighbor_indices[i].tolist()))
+            for i in range(len(batch.prediction))]
+
+
+def scaler_params(scaler):
+    """``(mean, scale)`` with which ``(X - mean) / scale`` equals ``scaler.transform(X)``.
+
+    Honors ``with_mean``/``with_std``; returns ``None`` for anything but a
+    fitted ``StandardScaler`` (or a mapped one).
+    """
+    if not all(hasattr(scaler, a) for a in ("with_mean", "with_std", "mean_", "scale_")):
+        return None
+    n_features = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return np.asarray(mean, dtype=float), np.asarray(scale, dtype=float)
+
+
+def load_artifacts(model_path="knn_heart_model.pkl", scaler_path="scaler.pkl"):
+    """Load the pickled KNN model and its StandardScaler."""
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    with open(scaler_path, "rb") as f:
+        scaler = pickle.load(f)
+    return model, scaler
+
+
+def load_metadata(model_path="knn_heart_model.pkl"):
+    """Read the training metadata exported next to the model, if any."""
+    path = os.path.join(os.path.dirname(model_path), METADATA_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def training_positions(n_rows, test_size=0.2, random_state=42):
+    """Positions of the rows ``train_test_split`` puts on the training side, in order.
+
+    Reproduces ``train_test_split(rows, test_size=test_size,
+    random_state=random_state)`` for a float ``test_size`` and an integer
+    seed without importing scikit-learn.
+    """
+    n_test = int(np.ceil(test_size * n_rows))
+    return np.random.RandomState(random_state).permutation(n_rows)[n_test:]
+
+
+class PredictionCache:
+    """Thread-safe LRU cache of ``RiskScore`` results keyed on the feature vector.
+
+    Every UI input is discrete, so repeated patient profiles map to identical
+    keys.  Entries older than ``ttl`` seconds (if set) are treated as misses.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(features):
+        return tuple(np.round(np.asarray(features, dtype=float), 6).tolist())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, score):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), score)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def vote_proba(dist, labels, n_classes, weights="uniform"):
+    """Class probabilities from neighbor labels, as ``predict_proba`` computes them."""
+    if weights == "distance":
+        with np.errstate(divide="ignore"):
+            w = 1.0 / dist
+        exact = np.isinf(w)
+        exact_rows = exact.any(axis=1)
+        w[exact_rows] = exact[exact_rows]
+    else:
+        w = np.ones_like(dist)
+
+    proba = np.empty((len(labels), n_classes))
+    for i in range(n_classes):
+        proba[:, i] = (w * (labels == i)).sum(axis=1)
+    return proba / proba.sum(axis=1, keepdims=True)
+
+
+class FusedKNN:
+    """Standardization, Euclidean neighbor search and vote in plain NumPy.
+
+    Replaces the ``scaler.transform`` + ``model.predict_proba`` pair (and
+    their per-call validation) for Euclidean KNN models.  Candidates are
+    selected with ``|z|^2 - 2 z.t + |t|^2`` (training norms precomputed)
+    written into a per-thread buffer reused across calls; the k winners'
+    distances are then recomputed directly.  Standardization runs the same
+    operations as ``StandardScaler.transform``, so a query equal to a
+    training row comes back at distance zero.
+    """
+
+    # Upper bound on the distance buffer, in float64 cells (128 MB)
+    MAX_BUFFER_CELLS = 1 << 24
+
+    def __init__(self, mean, scale, fit_X, y, n_classes, n_neighbors, weights="uniform"):
+        self.mean = mean
+        self.scale = scale
+        self.fit_X = fit_X
+        self.fit_sq = np.einsum("ij,ij->i", fit_X, fit_X)
+        self.y = y
+        self.n_classes = n_classes
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.chunk_rows = max(1, min(4096, self.MAX_BUFFER_CELLS // len(fit_X)))
+        self._local = threading.local()
+
+    @staticmethod
+    def supports(metric, p, weights):
+        """Whether a KNN with these parameters can be served by the kernel."""
+        euclidean = metric == "euclidean" or (metric == "minkowski" and p == 2)
+        return euclidean and weights in ("uniform", "distance")
+
+    @classmethod
+    def from_estimators(cls, model, scaler):
+        """Build from a fitted scaler and KNN, or return ``None`` if unsupported."""
+        if not cls.supports(model.metric, model.p, model.weights) or model.outputs_2d_:
+            return None
+        params = scaler_params(scaler)
+        if params is None:
+            return None
+        mean, scale = params
+        return cls(mean, scale, np.asarray(model._fit_X, dtype=float), model._y,
+                   len(model.classes_), model.n_neighbors, model.weights)
+
+    def _buffer(self, rows):
+        buf = getattr(self._local, "dist", None)
+        if buf is None or len(buf) < rows:
+            buf = self._local.dist = np.empty((rows, len(self.fit_X)))
+        return buf[:rows]
+
+    def standardize(self, X):
+        # Same operations as StandardScaler.transform, so a query equal to a
+        # training row lands exactly on it
+        Z = X - self.mean
+        Z /= self.scale
+        return Z
+
+    def kneighbors(self, Z):
+        """Return ``(dist, ind)`` of the k nearest training rows, nearest first."""
+        n, k = len(Z), self.n_neighbors
+        dist = np.empty((n, k))
+        ind = np.empty((n, k), dtype=np.intp)
+        for start in range(0, n, self.chunk_rows):
+            z = Z[start:start + self.chunk_rows]
+            d2 = self._buffer(len(z))
+            np.dot(z, self.fit_X.T, out=d2)
+            d2 *= -2
+            d2 += self.fit_sq
+            d2 += np.einsum("ij,ij->i", z, z)[:, None]
+            np.maximum(d2, 0, out=d2)
+
+            nearest = np.argpartition(d2, k - 1, axis=1)[:, :k]
+            diff = z[:, None, :] - self.fit_X[nearest]
+            near = np.sqrt(np.einsum("ijk,ijk->ij", diff, diff))
+            order = np.argsort(near, axis=1, kind="stable")
+            ind[start:start + len(z)] = np.take_along_axis(nearest, order, axis=1)
+            dist[start:start + len(z)] = np.take_along_axis(near, order, axis=1)
+        return dist, ind
+
+    def predict_proba(self, dist, ind):
+        return vote_proba(dist, self.y[ind], self.n_classes, self.weights)
+
+
+class _StageClock:
+    """Reports the wall time of each consecutive pipeline stage to a callback."""
+
+    def __init__(self, on_stage):
+        self.on_stage = on_stage
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        if self.on_stage is not None:
+            self.on_stage(stage, now - self.last)
+        self.last = now
+
+
+class RiskEngine:
+    """Scores raw (unscaled) feature vectors with the fitted scaler and KNN."""
+
+    def __init__(self, model, scaler, metadata=None, cache=None, lookup=None, fused=True):
+        self.model = model
+        self.scaler = scaler
+        self.metadata = metadata or {}
+        self.cache = cache
+        self.lookup = lookup
+        # Optional shared batcher for score_one (see scheduler.BatchScheduler)
+        self.scheduler = None
+        # Models the fused kernel cannot reproduce keep the sklearn path
+        self.kernel = FusedKNN.from_estimators(model, scaler) if fused else None
+
+    @classmethod
+    def load(cls, model_path="knn_heart_model.pkl", scaler_path="scaler.pkl",
+             cache=None, lookup=None, ann_index=None, nprobe=1):
+        """Load pickled artifacts, or a ``.knnz`` model file (which embeds the scaler).
+
+        ``ann_index``, the path of an ``ann.IVFIndex`` built for this model,
+        switches neighbor search to the approximate backend.
+        """
+        if model_path.endswith(".knnz"):
+            engine = cls.open(model_path, cache=cache, lookup=lookup)
+        else:
+            engine = cls(*load_artifacts(model_path, scaler_path), load_metadata(model_path),
+                         cache, lookup)
+        if ann_index is not None:
+            engine.use_ann_index(ann_index, nprobe)
+        return engine
+
+    @classmethod
+    def open(cls, path="knn_heart_model.knnz", verify=True, cache=None, lookup=None):
+        """Load a memory-mapped model written by ``modelfile.export_model``.
+
+        Models the fused kernel serves are built straight from the mapped
+        arrays, without importing scikit-learn.
+        """
+        from modelfile import load_model  # modelfile builds on this module
+        model, scaler, metadata = load_model(path, verify)
+        return cls(model, scaler, metadata, cache, lookup)
+
+    def use_ann_index(self, path, nprobe=1):
+        """Search only the ``nprobe`` closest cells of the IVF index at ``path``."""
+        from ann import ApproxKNN, IVFIndex  # ann builds on this module
+        if self.kernel is None:
+            raise ValueError("the approximate backend needs a Euclidean KNN model")
+        index = IVFIndex.load(path)
+        self.kernel = ApproxKNN.from_kernel(self.kernel, index, min(nprobe, index.n_lists))
+
+    def score_batch(self, X, on_stage=None):
+        """Score an ``(n, 13)`` array of raw features into ``BatchScores``.
+
+        ``on_stage(stage, seconds)`` is called as each of ``PIPELINE_STAGES``
+        completes, so callers can report real progress and timings.
+        """
+        X = check_features(X)
+        clock = _StageClock(on_stage)
+        if self.kernel is not None:
+            scaled = self.kernel.standardize(X)
+            clock.lap("scaling")
+            dist, ind = self.kernel.kneighbors(scaled)
+            clock.lap("neighbor_search")
+            proba = self.kernel.predict_proba(dist, ind)
+        else:
+            import pandas as pd
+
+            scaled = self.scaler.transform(pd.DataFrame(X, columns=FEATURE_COLUMNS))
+            clock.lap("scaling")
+            dist, ind = self.model.kneighbors(scaled)
+            clock.lap("neighbor_search")
+            proba = vote_proba(dist, self.model._y[ind], len(self.model.classes_), self.model.weights)
+        best = np.argmax(proba, axis=1)
+        prediction = self.model.classes_[best]
+        confidence = proba[np.arange(len(proba)), best] * 100
+        clock.lap("probability")
+        return BatchScores(prediction, proba[:, 1], confidence, dist, ind)
+
+    def _score_uncached(self, features, on_stage):
+        if self.scheduler is None:
+            return as_scores(self.score_batch([features], on_stage))[0]
+        score, stages = self.scheduler.submit(features).result()
+        if on_stage is not None:
+            for stage, seconds in stages:
+                on_stage(stage, seconds)
+        return score
+
+    def score_one(self, features, on_stage=None):
+        """Score a single 13-feature vector (sequence or column -> value mapping).
+
+        Vectors on the grid of an attached ``lookup`` table are answered by a
+        single index lookup (reported to ``on_stage`` as ``"lookup"``, without
+        neighbor info).  With a ``cache`` attached, repeated vectors skip
+        scaling and the neighbor search; a hit is reported as ``"cache"``.
+        With a ``scheduler`` attached, the remaining vectors are scored in
+        batches shared with other threads (waiting reported as ``"queue_wait"``).
+        """
+        if isinstance(features, dict):
+            features = encode_record(features)
+
+        clock = _StageClock(on_stage)
+        if self.lookup is not None:
+            score = self.lookup.get(features)
+            if score is not None:
+                clock.lap("lookup")
+                return score
+        if self.cache is None:
+            return self._score_uncached(features, on_stage)
+
+        key = self.cache.key(features)
+        score = self.cache.get(key)
+        if score is not None:
+            clock.lap("cache")
+            return score
+        score = self._score_uncached(features, on_stage)
+        self.cache.put(key, score)
+        return score
+
+    def explain(self, features, score=None, source=None):
+        """The k training patients behind ``score``, nearest first.
+
+        Reuses the neighbors ``score`` already carries, so no second search
+        runs; only lookup-table scores (which carry none) are re-scored.
+        Returns one row per neighbor with its distance, target, raw feature
+        values and ``contribution_<column>``: that feature's share of the
+        squared scaled distance, in percent.  ``source``, a frame whose rows
+        align with the training matrix, adds its index as ``patient``.
+        """
+        import pandas as pd
+
+        if isinstance(features, dict):
+            features = encode_record(features)
+        features = np.asarray(features, dtype=float)
+        if score is None or not score.neighbor_indices:
+            score = as_scores(self.score_batch([features]))[0]
+
+        ind = np.asarray(score.neighbor_indices, dtype=np.intp)
+        if self.kernel is not None:
+            neighbors = self.kernel.fit_X[ind]
+            query = self.kernel.standardize(features[None, :])
+            raw = neighbors * self.kernel.scale + self.kernel.mean
+        else:
+            neighbors = np.asarray(self.model._fit_X)[ind]
+            query = self.scaler.transform(pd.DataFrame([features], columns=FEATURE_COLUMNS))
+            raw = self.scaler.inverse_transform(neighbors)
+        sq_diff = (query - neighbors) ** 2
+        total = sq_diff.sum(axis=1, keepdims=True)
+        share = np.divide(sq_diff * 100, total, out=np.zeros_like(sq_diff), where=total > 0)
+
+        frame = pd.DataFrame(np.round(raw, 6), columns=FEATURE_COLUMNS)
+        frame.insert(0, "distance", score.neighbor_distances)
+        frame.insert(1, "target", self.model.classes_[self.model._y[ind]])
+        if source is not None:
+            frame.insert(0, "patient", source.index[ind])
+        frame[[f"contribution_{c}" for c in FEATURE_COLUMNS]] = share
+        frame.index = pd.RangeIndex(1, len(ind) + 1, name="rank")
+        return frame
+
+    def score_frame(self, df):
+        """Return ``df`` with prediction, probability and risk_level columns appended."""
+        missing = [c for c in FEATURE_COLUMNS if c not in df.columns]
+        if missing:
+            raise ValueError(f"missing required feature columns: {', '.join(missing)}")
+
+        batch = self.score_batch(df[FEATURE_COLUMNS].to_numpy(dtype=float))
+        scored = df.copy()
+        scored["prediction"] = batch.prediction
+        scored["probability"] = np.round(batch.probability, 4)
+        scored["risk_level"] = risk_levels(batch.prediction)
+        return scored
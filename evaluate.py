@@ -0,0 +1,118 @@
+"""Single-pass k-sweep evaluation over cross-validation folds.
+
+For KNN, one neighbor query at the largest k returns every query's
+neighbors sorted by distance, so the vote of any smaller k is a prefix of
+it.  Each fold is queried once at ``k_max``; cumulative sums over that
+neighbor list then give the out-of-fold probabilities of every k and every
+weighting at once, from which accuracy, ROC-AUC and calibration (Brier score
+and expected calibration error) are computed::
+
+    python evaluate.py --folds 5 --k-max 15 -o k_sweep.json
+"""
+import argparse
+import json
+
+import numpy as np
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from train import WEIGHT_OPTIONS, load_dataset
+
+
+def prefix_proba(dist, labels, n_classes, weights="uniform"):
+    """Class probabilities for every k from one sorted neighbor list.
+
+    ``dist`` and ``labels`` are ``(n, k_max)``; returns ``(n, k_max, n_classes)``
+    where ``[:, k - 1]`` equals ``predict_proba`` of a k-neighbor model.
+    """
+    one_hot = labels[:, :, None] == np.arange(n_classes)
+    if weights == "distance":
+        # sklearn gives exact matches all the weight when any are present
+        exact = dist == 0
+        with np.errstate(divide="ignore"):
+            w = np.where(exact, 0.0, 1.0 / dist)
+        votes = np.cumsum(w[:, :, None] * one_hot, axis=1)
+        exact_votes = np.cumsum(exact[:, :, None] & one_hot, axis=1)
+        has_exact = np.cumsum(exact, axis=1)[:, :, None] > 0
+        votes = np.where(has_exact, exact_votes, votes)
+    else:
+        votes = np.cumsum(one_hot, axis=1)
+    return votes / votes.sum(axis=2, keepdims=True)
+
+
+def calibration_error(y_true, p_positive, n_bins=10):
+    """Expected calibration error of positive-class probabilities over equal-width bins."""
+    bins = np.minimum((p_positive * n_bins).astype(int), n_bins - 1)
+    error = 0.0
+    for b in range(n_bins):
+        in_bin = bins == b
+        if in_bin.any():
+            error += in_bin.mean() * abs(y_true[in_bin].mean() - p_positive[in_bin].mean())
+    return float(error)
+
+
+def out_of_fold_proba(X, y, k_max=15, n_splits=5, weight_options=WEIGHT_OPTIONS,
+                      random_state=42):
+    """Out-of-fold probabilities ``{weights: (n, k_max, n_classes)}`` with one query per fold.
+
+    The scaler is refitted on each training fold, as in the real pipeline.
+    """
+    classes, y_encoded = np.unique(y, return_inverse=True)
+    oof = {w: np.empty((len(X), k_max, len(classes))) for w in weight_options}
+    folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    for train_idx, test_idx in folds.split(X, y_encoded):
+        scaler = StandardScaler().fit(X[train_idx])
+        index = NearestNeighbors(n_neighbors=k_max).fit(scaler.transform(X[train_idx]))
+        dist, ind = index.kneighbors(scaler.transform(X[test_idx]))
+        labels = y_encoded[train_idx][ind]
+        for weights in weight_options:
+            oof[weights][test_idx] = prefix_proba(dist, labels, len(classes), weights)
+    return classes, y_encoded, oof
+
+
+def evaluate_k_sweep(X, y, k_max=15, n_splits=5, weight_options=WEIGHT_OPTIONS,
+                     n_bins=10, random_state=42):
+    """Accuracy, ROC-AUC, Brier score and ECE for every (k, weights) pair."""
+    X = np.asarray(X, dtype=float)
+    classes, y_encoded, oof = out_of_fold_proba(X, np.asarray(y), k_max, n_splits,
+                                                weight_options, random_state)
+    binary = len(classes) == 2
+    results = []
+    for weights, proba in oof.items():
+        for k in range(1, k_max + 1):
+            p = proba[:, k - 1]
+            result = {"n_neighbors": k, "weights": weights,
+                      "accuracy": float(np.mean(p.argmax(axis=1) == y_encoded))}
+            if binary:
+                result["roc_auc"] = float(roc_auc_score(y_encoded, p[:, 1]))
+                result["brier"] = float(np.mean((p[:, 1] - y_encoded) ** 2))
+                result["ece"] = calibration_error(y_encoded, p[:, 1], n_bins)
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate every k in one neighbor query per fold.")
+    parser.add_argument("--data", default="heart.csv")
+    parser.add_argument("--k-max", type=int, default=15)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    X, y = load_dataset(args.data)
+    results = evaluate_k_sweep(X.to_numpy(), y.to_numpy(), args.k_max, args.folds,
+                               random_state=args.random_state)
+    for r in results:
+        print(f"k={r['n_neighbors']:>2} {r['weights']:>8}: accuracy {r['accuracy']:.3f}  "
+              f"roc_auc {r.get('roc_auc', float('nan')):.3f}  brier {r.get('brier', float('nan')):.3f}  "
+              f"ece {r.get('ece', float('nan')):.3f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Streaming report export as CSV, Parquet or printable HTML.
+
+Exports are generators over an iterable of DataFrame chunks (a single
+report, ``batch.iter_scored_chunks`` or ``HistoryStore.iter_pages``), each
+yielding the encoded output of one chunk before reading the next, so memory
+stays bounded by the chunk size and a consumer can start sending bytes
+before the export is complete::
+
+    python export.py history -o history.parquet --risk-level HIGH
+    python export.py cohort.csv --format html > report.html
+
+An export with no chunks still carries its columns when the caller passes
+``empty``, a zero-row frame with the expected columns and dtypes (such as
+``history.empty_frame()``).
+
+Parquet needs the optional ``pyarrow`` package.
+"""
+import argparse
+import html
+import itertools
+import sys
+import tempfile
+
+import history
+
+FORMATS = {
+    # format: (mime type, file extension)
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "html": ("text/html", "html"),
+}
+
+PRINT_CSS = """
+body { font-family: Arial, sans-serif; font-size: 11px; color: #111; }
+h1 { font-size: 16px; }
+table { border-collapse: collapse; width: 100%; }
+th, td { border: 1px solid #999; padding: 3px 6px; text-align: left; }
+thead { display: table-header-group; }
+tr { page-break-inside: avoid; }
+"""
+
+
+def iter_csv(frames, index=False, empty=None):
+    """Yield CSV text, the header with the first chunk only."""
+    i = -1
+    for i, frame in enumerate(frames):
+        yield frame.to_csv(header=(i == 0), index=index)
+    if i < 0 and empty is not None:
+        yield empty.to_csv(index=index)
+
+
+def iter_html(frames, title="Cardiac Risk Report", index=False, empty=None):
+    """Yield a printable HTML document, one ``<tr>`` block per chunk."""
+    yield (f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+           f"<style>{PRINT_CSS}</style></head><body><h1>{html.escape(title)}</h1>\n<table>\n")
+    frames = (frame.reset_index() if index else frame for frame in frames)
+    first = next(frames, None)
+    if first is not None:
+        frames = itertools.chain([first], frames)
+    elif empty is not None:
+        first = empty.reset_index() if index else empty
+    if first is not None:
+        yield ("<thead><tr>" + "".join(f"<th>{html.escape(str(c))}</th>" for c in first.columns)
+               + "</tr></thead>\n")
+    # Opened even for an empty export, so the document stays well formed
+    yield "<tbody>\n"
+    for frame in frames:
+        yield "".join("<tr>" + "".join(f"<td>{html.escape(str(v))}</td>" for v in row) + "</tr>\n"
+                      for row in frame.itertuples(index=False))
+    yield "</tbody></table></body></html>\n"
+
+
+class _ParquetSink:
+    """Write-only file object whose written bytes are drained after each row group."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def iter_parquet(frames, index=False, empty=None):
+    """Yield Parquet bytes, one row group per chunk, then the footer.
+
+    With no chunks the file is still valid: it has the schema of ``empty``
+    (or no columns) and no rows.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    sink, writer, schema = _ParquetSink(), None, None
+    for frame in frames:
+        if writer is None:
+            schema = pa.Schema.from_pandas(frame, preserve_index=index)
+            writer = pq.ParquetWriter(sink, schema)
+        # Later chunks may infer narrower dtypes; keep the first chunk's schema
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=index))
+        yield sink.drain()
+    if writer is None:
+        schema = (pa.Schema.from_pandas(empty, preserve_index=index) if empty is not None
+                  else pa.schema([]))
+        writer = pq.ParquetWriter(sink, schema)
+    writer.close()
+    yield sink.drain()
+
+
+def stream(frames, fmt, index=False, title="Cardiac Risk Report", empty=None):
+    """Dispatch to ``iter_csv`` / ``iter_parquet`` / ``iter_html`` by format name."""
+    if fmt == "csv":
+        return iter_csv(frames, index, empty)
+    if fmt == "parquet":
+        return iter_parquet(frames, index, empty)
+    if fmt == "html":
+        return iter_html(frames, title, index, empty)
+    raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def spool(chunks, max_memory=8 << 20):
+    """Collect streamed chunks into a rewound temporary file that spills to disk.
+
+    For consumers (such as ``st.download_button``) that need a file object.
+    """
+    dest = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    for chunk in chunks:
+        dest.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    dest.seek(0)
+    return dest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export assessment history or a scored cohort.")
+    parser.add_argument("source", help="'history' or a cohort CSV in the heart.csv layout")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output extension, else csv")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--db", default=history.DEFAULT_PATH)
+    parser.add_argument("--risk-level", choices=("HIGH", "LOW"))
+    parser.add_argument("--since", help="history from this YYYY-mm-dd[ HH:MM:SS]")
+    parser.add_argument("--until", help="history before this YYYY-mm-dd[ HH:MM:SS]")
+    parser.add_argument("--chunksize", type=int, default=10_000)
+    parser.add_argument("--model", default="knn_heart_model.pkl")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or next((f for f, (_, ext) in FORMATS.items()
+                               if args.output and args.output.endswith("." + ext)), "csv")
+    if args.source == "history":
+        store = history.HistoryStore(args.db)
+        frames = store.iter_pages(args.risk_level, args.since, args.until, args.chunksize)
+        chunks = stream(frames, fmt, index=True, empty=history.empty_frame())
+    else:
+        import batch
+        from engine import RiskEngine
+        engine = RiskEngine.load(args.model, args.scaler)
+        chunks = stream(batch.iter_scored_chunks(args.source, engine, args.chunksize), fmt)
+
+    if args.output:
+        with open(args.output, "wb") as dest:
+            for chunk in chunks:
+                dest.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                sys.stdout.write(chunk)
+            else:
+                sys.stdout.buffer.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
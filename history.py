@@ -0,0 +1,160 @@
+"""Persistent assessment history in an embedded SQLite database.
+
+Every assessment (inputs, prediction, confidence, model version, latency)
+is appended to ``history.db``.  Appends are buffered and written in one
+transaction per batch, by the caller once ``batch_size`` records are pending
+or by a background thread after ``flush_interval`` seconds.  Indexes on
+timestamp and (risk level, timestamp) back ``page``, which walks the history
+newest first with keyset pagination, so any page of millions of rows costs an
+index seek instead of an ``OFFSET`` scan::
+
+    store = HistoryStore("history.db")
+    store.append({"timestamp": "2026-01-01 12:00:00", "age": 63, ..., "latency_ms": 0.4})
+    rows, cursor = store.page(risk_level="HIGH", limit=50)
+    more, cursor = store.page(risk_level="HIGH", limit=50, after=cursor)
+"""
+import atexit
+import sqlite3
+import threading
+
+import pandas as pd
+
+from engine import FEATURE_COLUMNS
+
+DEFAULT_PATH = "history.db"
+
+COLUMNS = (["timestamp"] + FEATURE_COLUMNS
+           + ["prediction", "probability", "confidence", "risk_level", "model_version", "latency_ms"])
+
+
+def empty_frame():
+    """A zero-row frame shaped like ``HistoryStore.page`` results (indexed by ``id``)."""
+    dtypes = {"timestamp": object, **{c: "float64" for c in FEATURE_COLUMNS}, "prediction": "int64",
+              "probability": "float64", "confidence": "float64", "risk_level": object,
+              "model_version": object, "latency_ms": "float64"}
+    frame = pd.DataFrame({c: pd.Series(dtype=dtypes[c]) for c in COLUMNS})
+    return frame.set_index(pd.Index([], dtype="int64", name="id"))
+
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    {", ".join(f"{c} REAL" for c in FEATURE_COLUMNS)},
+    prediction INTEGER NOT NULL,
+    probability REAL,
+    confidence REAL,
+    risk_level TEXT NOT NULL,
+    model_version TEXT,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS idx_assessments_timestamp ON assessments (timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_assessments_risk_timestamp ON assessments (risk_level, timestamp, id);
+"""
+
+
+class HistoryStore:
+    """Batched, thread-safe writer and paged reader over one SQLite file."""
+
+    def __init__(self, path=DEFAULT_PATH, batch_size=64, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="history-flush",
+                                         daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def append(self, record):
+        """Buffer one assessment (a mapping with every name in ``COLUMNS``)."""
+        row = tuple(record[c] for c in COLUMNS)
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._write_pending()
+
+    def flush(self):
+        with self._lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO assessments ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})", self._pending)
+        self._pending.clear()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _filters(risk_level, since, until):
+        clauses, params = [], []
+        if risk_level is not None:
+            clauses.append("risk_level = ?")
+            params.append(risk_level)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        return clauses, params
+
+    def count(self, risk_level=None, since=None, until=None):
+        """Number of stored assessments matching the filters (pending ones included)."""
+        clauses, params = self._filters(risk_level, since, until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._write_pending()
+            return self._conn.execute(f"SELECT COUNT(*) FROM assessments {where}", params).fetchone()[0]
+
+    def page(self, risk_level=None, since=None, until=None, limit=50, after=None):
+        """Return ``(frame, cursor)``: up to ``limit`` assessments, newest first.
+
+        ``since``/``until`` are ``YYYY-mm-dd[ HH:MM:SS]`` bounds.  Pass the
+        returned ``cursor`` as ``after`` for the next page; it is ``None`` once
+        the history is exhausted.
+        """
+        clauses, params = self._filters(risk_level, since, until)
+        if after is not None:
+            clauses.append("(timestamp, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._write_pending()
+            frame = pd.read_sql_query(
+                f"SELECT id, {', '.join(COLUMNS)} FROM assessments {where} "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?", self._conn, params=params + [limit])
+        cursor = None
+        if len(frame) == limit:
+            cursor = (frame["timestamp"].iloc[-1], int(frame["id"].iloc[-1]))
+        return frame.set_index("id"), cursor
+
+    def iter_pages(self, risk_level=None, since=None, until=None, chunk_rows=10_000):
+        """Yield the matching history as DataFrames of up to ``chunk_rows``, newest first."""
+        cursor = None
+        while True:
+            frame, cursor = self.page(risk_level, since, until, chunk_rows, cursor)
+            if len(frame):
+                yield frame
+            if cursor is None:
+                return
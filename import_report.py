@@ -0,0 +1,81 @@
+"""Import-time report for the app's modules.
+
+Runs ``python -X importtime -c "import <module>"`` for each module in a
+fresh interpreter and reports its total import cost together with its most
+expensive direct imports, so cold-start regressions can be traced to the
+module that introduced them::
+
+    python import_report.py
+    python import_report.py engine batch sklearn.neighbors -o imports.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# What the page shell imports, then what the background warm-up adds
+DEFAULT_MODULES = ("streamlit", "numpy", "pandas", "engine", "timings", "history", "export",
+                   "lookup", "scheduler", "batch", "modelfile", "sklearn.neighbors")
+
+
+def import_times(module, python=sys.executable):
+    """Return ``[(name, depth, self_us, cumulative_us)]`` for importing ``module``.
+
+    ``depth`` is the nesting level in the import tree (0 for ``module``
+    itself and for what the interpreter imports at startup).
+    """
+    proc = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def summarize(module, entries, top=5):
+    """Total cost of ``module`` and its ``top`` heaviest direct imports, in ms."""
+    # Entries are printed children-first, so a module's direct imports are the
+    # depth-1 entries listed before it; earlier depth-0 ones are interpreter startup
+    own = next((i for i, (name, depth, _, _) in enumerate(entries) if name == module and depth == 0),
+               None)
+    if own is None:
+        # Already imported by the interpreter at startup (or built in): free to import
+        return {"module": module, "total_ms": 0.0, "preloaded": True, "heaviest_imports": []}
+    total = entries[own][3]
+    start = max((i for i, (_, depth, _, _) in enumerate(entries[:own]) if depth == 0), default=-1) + 1
+    direct = [(name, cumulative) for name, depth, _, cumulative in entries[start:own] if depth == 1]
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return {"module": module, "total_ms": total / 1000, "preloaded": False,
+            "heaviest_imports": [{"module": name, "ms": us / 1000} for name, us in direct[:top]]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report what each module costs to import.")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES))
+    parser.add_argument("--top", type=int, default=5, help="direct imports listed per module")
+    parser.add_argument("-o", "--output", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = [summarize(m, import_times(m), args.top) for m in args.modules]
+    for entry in report:
+        if entry["preloaded"]:
+            print(f"{entry['module']:>20}: preloaded at interpreter startup")
+            continue
+        heaviest = ", ".join(f"{i['module']} {i['ms']:.0f}" for i in entry["heaviest_imports"])
+        print(f"{entry['module']:>20}: {entry['total_ms']:8.1f} ms  ({heaviest})")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Precomputed prediction lookup table over the discrete input grid.
+
+Every app input is discrete, so the model can be evaluated offline over a
+grid of input values and stored as one byte per grid cell (the number of
+high-risk votes among the k neighbors).  At runtime the table is memory
+mapped, so pages are only read when a cell is looked up, and an on-grid
+input is scored with a single index computation.  Off-grid inputs fall back
+to the engine.
+
+The full UI domain has ~10^14 cells, so the continuous axes are quantized
+with configurable steps::
+
+    python lookup.py --step age=5 --step oldpeak=0.5 -o lookup_table.npy
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from engine import FEATURE_COLUMNS, LABEL_MAPS, RiskEngine, RiskScore
+
+# Slider bounds used by the app for the continuous inputs: (start, stop)
+CONTINUOUS_RANGES = {"age": (20, 100), "trestbps": (80, 200), "chol": (100, 600),
+                     "thalach": (60, 220), "oldpeak": (0.0, 6.0)}
+
+# Default quantization steps; the result is ~1.03e8 cells (~103 MB)
+DEFAULT_STEPS = {"age": 10, "trestbps": 20, "chol": 100, "thalach": 20, "oldpeak": 1.0}
+
+CHUNK_CELLS = 200_000
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_axes(steps=None):
+    """Return the grid values of every feature, in ``FEATURE_COLUMNS`` order."""
+    steps = {**DEFAULT_STEPS, **(steps or {})}
+    axes = []
+    for column in FEATURE_COLUMNS:
+        if column in CONTINUOUS_RANGES:
+            start, stop = CONTINUOUS_RANGES[column]
+            count = int(round((stop - start) / steps[column])) + 1
+            axes.append(np.round(start + np.arange(count) * steps[column], 6))
+        else:
+            axes.append(np.array(sorted(set(LABEL_MAPS[column].values())), dtype=float))
+    return axes
+
+
+class LookupTable:
+    """Memory-mapped vote counts for every cell of a feature grid."""
+
+    def __init__(self, votes, axes, n_neighbors, model_sha256=None):
+        self.votes = votes
+        self.axes = axes
+        self.n_neighbors = n_neighbors
+        self.model_sha256 = model_sha256
+
+    @classmethod
+    def open(cls, path="lookup_table.npy"):
+        """Map ``path`` read-only; nothing is read until cells are looked up."""
+        with open(_spec_path(path)) as f:
+            spec = json.load(f)
+        votes = np.load(path, mmap_mode="r")
+        axes = [np.asarray(values, dtype=float) for values in spec["axes"]]
+        return cls(votes, axes, spec["n_neighbors"], spec.get("model_sha256"))
+
+    def index(self, features):
+        """Grid index of ``features``, or ``None`` if it is not on the grid."""
+        index = []
+        for value, axis in zip(np.asarray(features, dtype=float), self.axes):
+            i = int(np.searchsorted(axis, value - 1e-6))
+            if i >= len(axis) or abs(axis[i] - value) > 1e-6:
+                return None
+            index.append(i)
+        return tuple(index)
+
+    def get(self, features):
+        """Return the ``RiskScore`` for an on-grid vector, else ``None``."""
+        index = self.index(features)
+        if index is None:
+            return None
+        probability = int(self.votes[index]) / self.n_neighbors
+        prediction = int(probability > 0.5)
+        confidence = max(probability, 1 - probability) * 100
+        return RiskScore(prediction, probability, confidence,
+                         "HIGH" if prediction == 1 else "LOW", (), ())
+
+
+def _spec_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def precompute(engine, path, axes, model_sha256=None, chunk_cells=CHUNK_CELLS, progress=None):
+    """Score every grid cell with ``engine`` and write the table to ``path``."""
+    if engine.model.weights != "uniform" or list(engine.model.classes_) != [0, 1]:
+        raise ValueError("lookup tables require a uniform-weight binary KNN model")
+
+    n_neighbors = engine.model.n_neighbors
+    shape = tuple(len(axis) for axis in axes)
+    votes = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=shape)
+    flat = votes.reshape(-1)
+    total = flat.size
+
+    for start in range(0, total, chunk_cells):
+        stop = min(start + chunk_cells, total)
+        cells = np.unravel_index(np.arange(start, stop), shape)
+        X = np.column_stack([axis[i] for axis, i in zip(axes, cells)])
+        probability = engine.score_batch(X).probability
+        flat[start:stop] = np.rint(probability * n_neighbors).astype(np.uint8)
+        if progress is not None:
+            progress(stop, total)
+    votes.flush()
+
+    with open(_spec_path(path), "w") as f:
+        json.dump({"columns": FEATURE_COLUMNS, "axes": [axis.tolist() for axis in axes],
+                   "n_neighbors": n_neighbors, "model_sha256": model_sha256}, f)
+    return LookupTable.open(path)
+
+
+def _parse_steps(items):
+    steps = {}
+    for item in items:
+        column, _, value = item.partition("=")
+        if column not in CONTINUOUS_RANGES:
+            raise SystemExit(f"--step column must be one of {', '.join(CONTINUOUS_RANGES)}")
+        steps[column] = float(value)
+    return steps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the prediction lookup table.")
+    parser.add_argument("-o", "--output", default="lookup_table.npy")
+    parser.add_argument("--step", action="append", default=[], metavar="COLUMN=STEP",
+                        help="quantization step of a continuous input (repeatable)")
+    parser.add_argument("--model", default="knn_heart_model.pkl")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    args = parser.parse_args(argv)
+
+    axes = build_axes(_parse_steps(args.step))
+    cells = int(np.prod([len(axis) for axis in axes]))
+    print(f"Grid: {cells:,} cells ({cells / 1e6:.1f} MB)")
+
+    engine = RiskEngine.load(args.model, args.scaler)
+    precompute(engine, args.output, axes, file_sha256(args.model),
+               progress=lambda done, total: print(f"\r{done / total:6.1%}", end="", flush=True))
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
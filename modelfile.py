@@ -0,0 +1,201 @@
+"""Memory-mapped model file format (``.knnz``).
+
+A fitted KNN model is essentially its training matrix plus labels, so
+instead of unpickling it on every cold start the scaler parameters and the
+neighbor matrix are stored as raw, 64-byte aligned arrays that are memory
+mapped at load time.  Worker processes mapping the same file share one copy
+of its pages.  Euclidean models are served by the engine's fused kernel
+straight from the mapped arrays, so loading them neither imports
+scikit-learn nor builds a search index.
+
+Layout::
+
+    8 bytes   magic  b"KNNHEART"
+    4 bytes   format version (little-endian uint32)
+    4 bytes   header length (little-endian uint32)
+    ...       JSON header: model params, array dtypes/shapes/offsets,
+              SHA-256 of the data section, training metadata
+    ...       array data, each array starting on a 64-byte boundary
+
+Convert the shipped pickles with::
+
+    python modelfile.py --model knn_heart_model.pkl --scaler scaler.pkl -o knn_heart_model.knnz
+"""
+import argparse
+import hashlib
+import json
+import struct
+
+import numpy as np
+
+from engine import FEATURE_COLUMNS, FusedKNN, load_artifacts, load_metadata, scaler_params
+
+MAGIC = b"KNNHEART"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def export_model(model, scaler, path, metadata=None):
+    """Write ``model`` and ``scaler`` to ``path`` in the ``.knnz`` format.
+
+    The scaler is stored as the ``(mean, scale)`` its transform applies, so
+    ``with_mean=False`` / ``with_std=False`` become zeros / ones.
+    """
+    params = scaler_params(scaler)
+    if params is None:
+        raise ValueError(f".knnz files need a fitted StandardScaler, got {type(scaler).__name__}")
+    mean, scale = params
+    arrays = {
+        "mean": np.ascontiguousarray(mean, dtype=np.float64),
+        "scale": np.ascontiguousarray(scale, dtype=np.float64),
+        "fit_X": np.ascontiguousarray(model._fit_X, dtype=np.float64),
+        "y": np.ascontiguousarray(model._y, dtype=np.int64),
+        "classes": np.ascontiguousarray(model.classes_, dtype=np.int64),
+    }
+
+    layout, offset, digest = {}, 0, hashlib.sha256()
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    data_size = offset
+
+    # Checksum covers the data section exactly as laid out on disk, padding included
+    data = bytearray(data_size)
+    for name, array in arrays.items():
+        start = layout[name]["offset"]
+        data[start:start + array.nbytes] = array.tobytes()
+    digest.update(data)
+
+    header = json.dumps({
+        "feature_columns": FEATURE_COLUMNS,
+        "params": {"n_neighbors": int(model.n_neighbors), "weights": model.weights,
+                   "algorithm": model.algorithm, "leaf_size": int(model.leaf_size),
+                   "metric": model.metric, "p": model.p,
+                   "n_samples_seen": int(np.max(scaler.n_samples_seen_))},
+        "arrays": layout,
+        "data_size": data_size,
+        "sha256": digest.hexdigest(),
+        "metadata": metadata or {},
+    }).encode()
+    data_start = _align(_PREAMBLE.size + len(header))
+
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - _PREAMBLE.size - len(header)))
+        f.write(data)
+
+
+def read_header(path):
+    """Return ``(header, data_start)`` after validating magic and version."""
+    with open(path, "rb") as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a .knnz model file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        header = json.loads(f.read(header_len))
+    return header, _align(_PREAMBLE.size + header_len)
+
+
+def map_arrays(path, verify=True):
+    """Memory-map every array of a ``.knnz`` file; return ``(arrays, header)``.
+
+    ``verify`` hashes the data section against the stored checksum, which
+    reads every page once; skip it for workers mapping an already verified file.
+    """
+    header, data_start = read_header(path)
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=data_start,
+                     shape=(header["data_size"],))
+    if verify and hashlib.sha256(data).hexdigest() != header["sha256"]:
+        raise ValueError(f"{path} failed its checksum; the file is corrupt")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        start = spec["offset"]
+        arrays[name] = data[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return arrays, header
+
+
+class MappedKNN:
+    """The fitted attributes of a mapped KNN model that the fused kernel reads."""
+
+    outputs_2d_ = False
+
+    def __init__(self, arrays, params):
+        self.n_neighbors = params["n_neighbors"]
+        self.weights = params["weights"]
+        self.algorithm = params["algorithm"]
+        self.leaf_size = params["leaf_size"]
+        self.metric = params["metric"]
+        self.p = params["p"]
+        self._fit_X = arrays["fit_X"]
+        self._y = arrays["y"]
+        self.classes_ = arrays["classes"]
+        self.n_features_in_ = arrays["fit_X"].shape[1]
+
+
+class MappedScaler:
+    """The fitted attributes of a mapped StandardScaler."""
+
+    # The stored mean and scale already fold in the original flags
+    with_mean = True
+    with_std = True
+
+    def __init__(self, arrays, params, feature_columns):
+        self.mean_ = arrays["mean"]
+        self.scale_ = arrays["scale"]
+        self.var_ = arrays["scale"] ** 2
+        self.n_features_in_ = len(feature_columns)
+        self.feature_names_in_ = np.array(feature_columns, dtype=object)
+        self.n_samples_seen_ = params["n_samples_seen"]
+
+
+def load_model(path, verify=True):
+    """Rebuild ``(model, scaler, metadata)`` on top of the mapped arrays.
+
+    Models ``FusedKNN`` supports come back as ``MappedKNN``/``MappedScaler``
+    views of the arrays.  Anything else is refitted as a scikit-learn
+    ``KNeighborsClassifier``, whose tree algorithms build their index at load
+    time.
+    """
+    arrays, header = map_arrays(path, verify)
+    params = header["params"]
+    mapped_scaler = MappedScaler(arrays, params, header["feature_columns"])
+    if FusedKNN.supports(params["metric"], params["p"], params["weights"]):
+        return MappedKNN(arrays, params), mapped_scaler, header["metadata"]
+
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    vars(scaler).update(vars(mapped_scaler))
+    model = KNeighborsClassifier(n_neighbors=params["n_neighbors"], weights=params["weights"],
+                                 algorithm=params["algorithm"], leaf_size=params["leaf_size"],
+                                 metric=params["metric"], p=params["p"])
+    model.fit(arrays["fit_X"], arrays["classes"][arrays["y"]])
+    return model, scaler, header["metadata"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert pickled artifacts to the .knnz format.")
+    parser.add_argument("--model", default="knn_heart_model.pkl")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("-o", "--output", default="knn_heart_model.knnz")
+    args = parser.parse_args(argv)
+
+    model, scaler = load_artifacts(args.model, args.scaler)
+    export_model(model, scaler, args.output, load_metadata(args.model))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Parity check of the fused kernel against scikit-learn.
+
+Fits scaler/KNN variants on ``heart.csv`` (every ``with_mean``/``with_std``
+combination, uniform and distance weighting) and checks that
+``RiskEngine.score_batch``, through the fused kernel and through a
+``.knnz`` round trip, matches ``scaler.transform`` + ``model.predict_proba``
+and ``model.kneighbors`` on predictions, probabilities and neighbor
+distances.  Exits non-zero on any mismatch::
+
+    python parity.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+from engine import FEATURE_COLUMNS, RiskEngine
+from modelfile import export_model
+
+SCALER_VARIANTS = [{"with_mean": m, "with_std": s} for m in (True, False) for s in (True, False)]
+WEIGHT_OPTIONS = ("uniform", "distance")
+
+
+def compare(engine, model, scaler, X, atol=1e-9):
+    """Mismatch counts of ``engine.score_batch(X)`` against the sklearn estimators."""
+    frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+    scaled = scaler.transform(frame)
+    expected_proba = model.predict_proba(scaled)
+    expected_dist, _ = model.kneighbors(scaled)
+
+    batch = engine.score_batch(X)
+    return {
+        "fused_kernel": engine.kernel is not None,
+        "prediction": int((batch.prediction != model.classes_[expected_proba.argmax(axis=1)]).sum()),
+        "probability": int((~np.isclose(batch.probability, expected_proba[:, 1], atol=atol)).sum()),
+        "neighbor_distances": int((~np.isclose(batch.neighbor_distances, expected_dist,
+                                               atol=atol)).any(axis=1).sum()),
+    }
+
+
+def check(data_path="heart.csv", n_neighbors=7, test_size=0.2, random_state=42):
+    """Return ``[(variant, source, mismatches)]`` for every scaler/weights variant."""
+    df = pd.read_csv(data_path)
+    train, _ = train_test_split(df, test_size=test_size, random_state=random_state)
+    X_all = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scaler_params in SCALER_VARIANTS:
+            scaler = StandardScaler(**scaler_params).fit(train[FEATURE_COLUMNS])
+            for weights in WEIGHT_OPTIONS:
+                model = KNeighborsClassifier(n_neighbors=n_neighbors, weights=weights)
+                model.fit(scaler.transform(train[FEATURE_COLUMNS]), train["target"])
+                variant = {**scaler_params, "weights": weights}
+
+                results.append((variant, "pickle", compare(RiskEngine(model, scaler), model, scaler, X_all)))
+                path = os.path.join(tmp, "model.knnz")
+                export_model(model, scaler, path)
+                results.append((variant, "knnz", compare(RiskEngine.open(path), model, scaler, X_all)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the fused kernel against scikit-learn.")
+    parser.add_argument("--data", default="heart.csv")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for variant, source, mismatches in check(args.data):
+        counts = {k: v for k, v in mismatches.items() if k != "fused_kernel"}
+        ok = not any(counts.values()) and mismatches["fused_kernel"]
+        failed |= not ok
+        label = " ".join(f"{k}={v}" for k, v in variant.items())
+        print(f"{'ok  ' if ok else 'FAIL'} {source:>6} {label}: "
+              + ", ".join(f"{k} {v}" for k, v in counts.items()))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Shared asyncio micro-batching scheduler for in-process callers.
+
+Streamlit runs every session's script in its own thread, as ``server.py``
+does every request, so concurrent scans would each pay for a separate
+neighbor search.  ``BatchScheduler`` owns an asyncio event loop on a
+background thread; callers ``submit`` a feature vector from any thread and
+block on the returned future while the loop groups everything queued within
+one window (``max_batch_size`` requests or ``max_wait`` seconds, whichever
+comes first) into a single ``score_batch`` call::
+
+    scheduler = BatchScheduler(engine, max_batch_size=64, max_wait=0.002)
+    engine.scheduler = scheduler   # score_one misses now go through it
+    score, stages = scheduler.submit(features).result()
+
+Each future resolves to ``(RiskScore, stages)``: the ``(stage, seconds)``
+timings of the batch it rode in, starting with its own ``"queue_wait"``, so
+callers can report them from their own thread.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from engine import FEATURE_COLUMNS, as_scores, check_features
+
+
+class BatchScheduler:
+    """Groups scoring requests from many threads into one batch per window."""
+
+    def __init__(self, engine, max_batch_size=64, max_wait=0.002):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self._serve, name="batch-scheduler", daemon=True)
+        self._thread.start()
+        self._started.wait()
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._loop.call_soon(self._started.set)
+        self._loop.run_until_complete(self._run())
+
+    def submit(self, features):
+        """Queue one feature vector; return a Future of ``(RiskScore, stages)``."""
+        features = np.asarray(features, dtype=float)
+        # Checked here so one malformed request cannot fail a shared batch
+        if features.shape != (len(FEATURE_COLUMNS),):
+            raise ValueError(f"expected {len(FEATURE_COLUMNS)} features, got shape {features.shape}")
+        check_features(features[None, :])
+        future = Future()
+        item = (features, future, time.perf_counter())
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        return future
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        self._thread.join()
+
+    async def _collect(self):
+        first = await self._queue.get()
+        if first is None:
+            return None
+        items = [first]
+        deadline = self._loop.time() + self.max_wait
+        while len(items) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                self._queue.put_nowait(None)  # finish this batch, then stop
+                break
+            items.append(item)
+        return items
+
+    def _score(self, items):
+        started = time.perf_counter()
+        stages = []
+        try:
+            batch = self.engine.score_batch(np.vstack([f for f, _, _ in items]),
+                                            on_stage=lambda stage, seconds: stages.append((stage, seconds)))
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+        for (_, future, queued), score in zip(items, as_scores(batch)):
+            future.set_result((score, [("queue_wait", started - queued)] + stages))
+
+    async def _run(self):
+        while True:
+            items = await self._collect()
+            if items is None:
+                return
+            self.batches += 1
+            self.requests += len(items)
+            # Scored off the loop so requests keep queueing for the next window
+            await self._loop.run_in_executor(None, self._score, items)
@@ -0,0 +1,158 @@
+"""HTTP/JSON inference server for the cardiac risk model.
+
+Routes::
+
+    POST /predict         one patient record        -> risk score
+    POST /predict/batch   {"records": [record, ...]} -> {"results": [...]}
+    GET  /healthz         process liveness
+    GET  /readyz          200 once the model is loaded, warmed up and the scheduler runs
+    GET  /metrics         Prometheus latency summaries of routes and inference stages
+
+A record maps every ``heart.csv`` feature column to a value; categorical
+features accept the numeric code or the label shown in the app.  Concurrent
+``/predict`` calls are micro-batched into a single ``score_batch`` call by
+the same ``scheduler.BatchScheduler`` the app uses.  Each pre-forked worker
+keeps its own latency percentiles.
+
+    python server.py --port 8000 --workers 4
+"""
+import argparse
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from engine import as_scores, encode_record
+from scheduler import BatchScheduler
+from timings import LatencyRecorder
+from warmup import preload
+
+
+class RiskRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length))
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            body = self.server.timings.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/readyz":
+            if self.server.scheduler is not None and self.server.scheduler.is_alive():
+                self._send_json(200, {"status": "ready", "warmup": self.server.warmup})
+            else:
+                self._send_json(503, {"status": "loading"})
+        else:
+            self._send_json(404, {"error": f"unknown route {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/predict", "/predict/batch"):
+            self._send_json(404, {"error": f"unknown route {self.path}"})
+            return
+        if self.server.scheduler is None:
+            self._send_json(503, {"error": "model is not loaded yet"})
+            return
+
+        start = time.perf_counter()
+        try:
+            payload = self._read_json()
+            if self.path == "/predict":
+                # Goes through engine.scheduler, which reports the batch's stages
+                score = self.server.engine.score_one(encode_record(payload),
+                                                     on_stage=self.server.timings.record)
+                self._send_json(200, score._asdict())
+            else:
+                X = np.vstack([encode_record(r) for r in payload["records"]])
+                scores = as_scores(self.server.engine.score_batch(
+                    X, on_stage=self.server.timings.record))
+                self._send_json(200, {"results": [s._asdict() for s in scores]})
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+        self.server.timings.record(self.path, time.perf_counter() - start)
+
+
+class RiskServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, access_log=False):
+        super().__init__(address, RiskRequestHandler)
+        self.access_log = access_log
+        self.engine = None
+        self.scheduler = None
+        self.warmup = None
+        self.timings = LatencyRecorder()
+
+    def activate_model(self, engine, max_batch_size=256, max_wait=0.002):
+        self.engine = engine
+        self.scheduler = engine.scheduler = BatchScheduler(engine, max_batch_size, max_wait)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the cardiac risk model over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="pre-forked processes sharing the listening socket")
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0,
+                        help="how long a micro-batch waits for more requests")
+    parser.add_argument("--model", default="knn_heart_model.pkl",
+                        help="pickled model or .knnz model file (shared by mapping)")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--ann-index", help="serve approximate search from this ann.py index")
+    parser.add_argument("--nprobe", type=int, default=4,
+                        help="IVF cells searched per query with --ann-index")
+    parser.add_argument("--warmup-rows", type=int, default=32,
+                        help="heart.csv rows scored before serving (0 to skip)")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+
+    # Load and warm up before forking so every worker starts warm and the
+    # workers share the model's read-only pages
+    engine, warmup = preload(args.model, args.scaler, n_rows=args.warmup_rows,
+                             ann_index=args.ann_index, nprobe=args.nprobe)
+    httpd = RiskServer((args.host, args.port), access_log=args.access_log)
+    httpd.warmup = warmup
+    httpd.timings.record("model_load", warmup["load_ms"] / 1000)
+    print(f"model ready: loaded in {warmup['load_ms']:.0f} ms, "
+          f"warmed up with {warmup.get('rows', 0)} rows", flush=True)
+    for _ in range(args.workers - 1):
+        if os.fork() == 0:
+            break
+
+    # Threads do not survive fork, so every worker starts its own scheduler
+    httpd.activate_model(engine, args.max_batch_size, args.max_wait_ms / 1000)
+    print(f"[{os.getpid()}] serving on http://{args.host}:{args.port}", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
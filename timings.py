@@ -0,0 +1,93 @@
+"""In-memory latency percentiles for the hot path.
+
+Stages (model load, input mapping, the inference stages reported by
+``RiskEngine``, dashboard sections, server routes) record their wall time
+into a ``LatencyRecorder``.  The most recent ``window`` samples per stage back
+the percentiles; counts and totals cover the whole process lifetime, so the
+Prometheus export behaves like a regular summary metric::
+
+    recorder = LatencyRecorder()
+    watch = recorder.stopwatch()
+    ...
+    watch.lap("charts")
+    print(recorder.to_prometheus())
+"""
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Stopwatch:
+    """Records the wall time of each consecutive section into a recorder."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.recorder.record(stage, now - self.last)
+        self.last = now
+
+    def reset(self):
+        self.last = time.perf_counter()
+
+
+class LatencyRecorder:
+    """Thread-safe per-stage latency samples; shareable across sessions and threads."""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._samples = {}
+        self._count = {}
+        self._total = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.window)
+                self._count[stage] = 0
+                self._total[stage] = 0.0
+            self._samples[stage].append(seconds)
+            self._count[stage] += 1
+            self._total[stage] += seconds
+
+    def stopwatch(self):
+        return Stopwatch(self)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._count.clear()
+            self._total.clear()
+
+    def summary(self):
+        """``{stage: {"count", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}}`` in first-seen order."""
+        with self._lock:
+            snapshot = {stage: (np.array(samples), self._count[stage], self._total[stage])
+                        for stage, samples in self._samples.items()}
+        summary = {}
+        for stage, (samples, count, total) in snapshot.items():
+            ms = np.percentile(samples, [q * 100 for q in QUANTILES]) * 1000
+            summary[stage] = {"count": count, "mean_ms": total / count * 1000,
+                              **{f"p{round(q * 100)}_ms": float(v) for q, v in zip(QUANTILES, ms)}}
+        return summary
+
+    def to_prometheus(self, name="cardiac_stage_latency_seconds"):
+        """Prometheus text exposition (format 0.0.4) of every stage as one summary metric."""
+        with self._lock:
+            snapshot = [(stage, np.array(samples), self._count[stage], self._total[stage])
+                        for stage, samples in self._samples.items()]
+        lines = [f"# HELP {name} Wall time per pipeline stage or dashboard section.",
+                 f"# TYPE {name} summary"]
+        for stage, samples, count, total in snapshot:
+            for q, value in zip(QUANTILES, np.quantile(samples, QUANTILES)):
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {value:.9f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.9f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        return "\n".join(lines) + "\n"
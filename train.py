@@ -0,0 +1,228 @@
+"""Reproducible training pipeline for the KNN heart model.
+
+Replaces the manual steps of ``KNN Classifier Sol.ipynb``: split
+``heart.csv``, fit the StandardScaler, sweep k (and the vote weighting),
+time the scoring path the engine will serve, and export versioned artifacts
+with their metadata::
+
+    python train.py --out-dir models --install .
+    python train.py --select-best --k-max 25
+
+Each run writes ``<out-dir>/<version>/`` with ``knn_heart_model.pkl``,
+``scaler.pkl``, ``knn_heart_model.knnz`` and ``model_metadata.json`` (plus
+``ann_index.npz`` with ``--ann-index``); ``--install DIR`` also exports the
+artifacts into ``DIR`` for the app.
+
+The k sweep computes one neighbor graph at the largest k and reads every
+smaller k off its sorted prefix instead of refitting a model per k; the grid
+points are evaluated in parallel.
+
+``RiskEngine`` serves Euclidean models through its fused NumPy kernel, so
+``query_latency_ms`` times ``score_batch``.  The scikit-learn search algorithm
+(brute, KD-tree or Ball-tree) is still benchmarked and the fastest one stored
+on the model, but it only matters on the sklearn fallback path (``fused=False``
+or models the kernel cannot serve).
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+from ann import INDEX_FILE, IVFIndex
+from engine import FEATURE_COLUMNS, METADATA_FILE, RiskEngine, vote_proba
+from lookup import file_sha256
+from modelfile import export_model
+
+SEARCH_ALGORITHMS = ("brute", "kd_tree", "ball_tree")
+WEIGHT_OPTIONS = ("uniform", "distance")
+
+
+def load_dataset(path="heart.csv"):
+    df = pd.read_csv(path)
+    return df[FEATURE_COLUMNS], df["target"]
+
+
+def time_queries(search, queries, repeats=3):
+    """Return median single-row and per-row batched latency of ``search(rows)`` in ms."""
+    single = []
+    for _ in range(repeats):
+        for row in queries:
+            start = time.perf_counter()
+            search(row[None, :])
+            single.append(time.perf_counter() - start)
+
+    batched = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        search(queries)
+        batched.append((time.perf_counter() - start) / len(queries))
+
+    return {"single_ms": float(np.median(single) * 1000),
+            "batch_per_row_ms": float(np.median(batched) * 1000)}
+
+
+def select_algorithm(X_train, y_train, queries, n_neighbors, repeats=3):
+    """Fit one model per search algorithm; return (fastest, ``kneighbors`` latencies).
+
+    The fastest algorithm is the one with the lowest single-row latency, which
+    is what interactive scoring pays per request on the sklearn fallback path.
+    """
+    latencies = {}
+    for algorithm in SEARCH_ALGORITHMS:
+        model = KNeighborsClassifier(n_neighbors=n_neighbors, algorithm=algorithm)
+        model.fit(X_train, y_train)
+        latencies[algorithm] = time_queries(model.kneighbors, queries, repeats)
+    fastest = min(latencies, key=lambda a: latencies[a]["single_ms"])
+    return fastest, latencies
+
+
+def neighbor_graph(X_train, y_train, X_query, k_max):
+    """Sorted ``(dist, ind)`` of the ``k_max`` nearest training rows of each query."""
+    graph = KNeighborsClassifier(n_neighbors=k_max).fit(X_train, y_train)
+    return graph.kneighbors(X_query)
+
+
+def sweep_k(dist, ind, y_train, y_test, ks, weight_options=WEIGHT_OPTIONS, workers=None):
+    """Held-out accuracy for every (k, weights) pair, read off one neighbor graph.
+
+    Because ``ind`` is sorted by distance, the neighbors of any k are its
+    first k columns; no model is refitted.
+    """
+    classes, y_encoded = np.unique(y_train, return_inverse=True)
+    y_test = np.asarray(y_test)
+
+    def evaluate(params):
+        k, weights = params
+        proba = vote_proba(dist[:, :k], y_encoded[ind[:, :k]], len(classes), weights)
+        accuracy = accuracy_score(y_test, classes[np.argmax(proba, axis=1)])
+        return {"n_neighbors": k, "weights": weights, "accuracy": float(accuracy)}
+
+    grid = [(k, w) for w in weight_options for k in ks]
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(evaluate, grid))
+
+
+def train(data_path="heart.csv", n_neighbors=7, weights="uniform", test_size=0.2,
+          random_state=42, k_max=15, select_best=False, workers=None, benchmark_queries=200):
+    """Fit scaler and model; return (model, scaler, metadata).
+
+    ``select_best`` replaces ``n_neighbors``/``weights`` with the best sweep
+    result (ties go to the smallest k).
+    """
+    X, y = load_dataset(data_path)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state)
+    raw_queries = X_test.to_numpy(dtype=float)[:benchmark_queries]
+
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train)
+    X_test = scaler.transform(X_test)
+    y_train = y_train.to_numpy()
+
+    dist, ind = neighbor_graph(X_train, y_train, X_test, k_max)
+    sweep = sweep_k(dist, ind, y_train, y_test, range(1, k_max + 1), workers=workers)
+    if select_best:
+        best = max(sweep, key=lambda r: (r["accuracy"], -r["n_neighbors"]))
+        n_neighbors, weights = best["n_neighbors"], best["weights"]
+
+    queries = X_test[:benchmark_queries]
+    algorithm, latencies = select_algorithm(X_train, y_train, queries, n_neighbors)
+
+    model = KNeighborsClassifier(n_neighbors=n_neighbors, weights=weights, algorithm=algorithm)
+    model.fit(X_train, y_train)
+    engine = RiskEngine(model, scaler)
+    served_latency = time_queries(engine.score_batch, raw_queries)
+
+    trained_at = datetime.now()
+    metadata = {
+        "version": trained_at.strftime("v%Y%m%d-%H%M%S"),
+        "trained_at": trained_at.isoformat(timespec="seconds"),
+        "data_path": data_path,
+        "data_sha256": file_sha256(data_path),
+        "sklearn_version": sklearn.__version__,
+        "numpy_version": np.__version__,
+        "n_neighbors": n_neighbors,
+        "weights": weights,
+        "test_size": test_size,
+        "random_state": random_state,
+        "train_rows": int(len(X_train)),
+        "test_accuracy": float(accuracy_score(y_test, model.predict(X_test))),
+        "k_sweep": sweep,
+        "served_by": "fused_kernel" if engine.kernel is not None else "sklearn",
+        "query_latency_ms": served_latency,
+        # Only used when the sklearn path serves the model
+        "algorithm": algorithm,
+        "fallback_algorithm_benchmark_ms": latencies,
+    }
+    return model, scaler, metadata
+
+
+def export(model, scaler, metadata, out_dir=".", ann_index=None):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "knn_heart_model.pkl"), "wb") as f:
+        pickle.dump(model, f)
+    with open(os.path.join(out_dir, "scaler.pkl"), "wb") as f:
+        pickle.dump(scaler, f)
+    with open(os.path.join(out_dir, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+    export_model(model, scaler, os.path.join(out_dir, "knn_heart_model.knnz"), metadata)
+    if ann_index is not None:
+        ann_index.save(os.path.join(out_dir, INDEX_FILE))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and export the KNN heart model.")
+    parser.add_argument("--data", default="heart.csv")
+    parser.add_argument("--n-neighbors", type=int, default=7)
+    parser.add_argument("--weights", choices=WEIGHT_OPTIONS, default="uniform")
+    parser.add_argument("--k-max", type=int, default=15, help="largest k in the sweep")
+    parser.add_argument("--select-best", action="store_true",
+                        help="use the best (k, weights) from the sweep")
+    # The shipped artifacts were fitted on an 80/20 split (the notebook shows 67/33)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=None, help="sweep threads")
+    parser.add_argument("--out-dir", default="models",
+                        help="artifacts go to <out-dir>/<version>/")
+    parser.add_argument("--install", metavar="DIR",
+                        help="also export the artifacts into DIR (e.g. . for the app)")
+    parser.add_argument("--ann-index", action="store_true",
+                        help=f"also build the approximate-search index ({INDEX_FILE})")
+    parser.add_argument("--ann-lists", type=int, default=None,
+                        help="k-means cells of the index (default: sqrt of the training rows)")
+    args = parser.parse_args(argv)
+
+    model, scaler, metadata = train(args.data, args.n_neighbors, args.weights, args.test_size,
+                                    args.random_state, args.k_max, args.select_best,
+                                    args.workers)
+    ann_index = IVFIndex.build(model._fit_X, args.ann_lists) if args.ann_index else None
+    version_dir = os.path.join(args.out_dir, metadata["version"])
+    export(model, scaler, metadata, version_dir, ann_index)
+    if args.install:
+        export(model, scaler, metadata, args.install, ann_index)
+
+    for result in metadata["k_sweep"]:
+        print(f"k={result['n_neighbors']:>2} {result['weights']:>8}: {result['accuracy']:.3f}")
+    served = metadata["query_latency_ms"]
+    print(f"{metadata['served_by']:>12}: {served['single_ms']:.4f} ms/query, "
+          f"{served['batch_per_row_ms']:.4f} ms/row batched (served)")
+    for algorithm, latency in metadata["fallback_algorithm_benchmark_ms"].items():
+        print(f"{algorithm:>12}: {latency['single_ms']:.4f} ms/query, "
+              f"{latency['batch_per_row_ms']:.4f} ms/row batched (sklearn fallback)")
+    print(f"Exported {metadata['version']}: k={metadata['n_neighbors']} {metadata['weights']} "
+          f"via {metadata['served_by']} (accuracy {metadata['test_accuracy']:.3f}) to {version_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Model preloading and warm-up.
+
+The first request after a process starts pays for loading the model, the
+first calls into NumPy/scikit-learn code paths and the first page faults on
+the model's memory.  ``preload`` loads the model and runs representative
+``heart.csv`` rows through the scoring path (single rows, a batch and a
+neighbor explanation) before any real request arrives, and returns a
+readiness report.
+
+``server.py`` preloads in the parent before forking its workers, so they
+all inherit the warmed model and share its read-only pages (with a
+``.knnz`` model, the mapped file itself).  The app warms up in its
+background loader.  As a container start or readiness step::
+
+    python warmup.py --model knn_heart_model.knnz --ready-file /tmp/model-ready
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import FEATURE_COLUMNS, RiskEngine
+
+
+def representative_rows(data_path="heart.csv", n_rows=32, seed=0):
+    """Up to ``n_rows`` feature vectors from ``data_path``, half from each target class."""
+    df = pd.read_csv(data_path)
+    per_class = max(1, n_rows // df["target"].nunique())
+    sample = df.groupby("target", group_keys=False).apply(
+        lambda rows: rows.sample(min(per_class, len(rows)), random_state=seed))
+    return sample[FEATURE_COLUMNS].to_numpy(dtype=float)
+
+
+def warm_up(engine, rows):
+    """Score ``rows`` through every hot path; return timings in ms.
+
+    Goes through ``score_batch`` rather than ``score_one`` so the warm-up
+    leaves the prediction cache and its hit counters untouched.
+    """
+    start = time.perf_counter()
+    single = []
+    for row in rows:
+        t = time.perf_counter()
+        score = engine.score_batch(row[None, :])
+        single.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    engine.score_batch(rows)
+    batch_seconds = time.perf_counter() - t
+    engine.explain(rows[-1], None)
+    engine.score_frame(pd.DataFrame(rows, columns=FEATURE_COLUMNS))
+    return {
+        "rows": len(rows),
+        "first_ms": single[0] * 1000,
+        "steady_p50_ms": float(np.median(single[1:] or single) * 1000),
+        "batch_ms": batch_seconds * 1000,
+        "warmup_ms": (time.perf_counter() - start) * 1000,
+        "fused_kernel": engine.kernel is not None,
+        "ann_nprobe": getattr(engine.kernel, "nprobe", None),
+        "last_prediction": int(score.prediction[0]),
+    }
+
+
+def preload(model_path="knn_heart_model.pkl", scaler_path="scaler.pkl", data_path="heart.csv",
+            n_rows=32, **engine_kwargs):
+    """Load and warm up a ``RiskEngine``; return ``(engine, readiness report)``."""
+    start = time.perf_counter()
+    engine = RiskEngine.load(model_path, scaler_path, **engine_kwargs)
+    report = {"model": model_path, "pid": os.getpid(),
+              "version": engine.metadata.get("version", "unversioned"),
+              "load_ms": (time.perf_counter() - start) * 1000}
+    if n_rows and os.path.exists(data_path):
+        report.update(warm_up(engine, representative_rows(data_path, n_rows)))
+    report["ready"] = True
+    return engine, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load and warm up the model; report readiness.")
+    parser.add_argument("--model", default="knn_heart_model.pkl",
+                        help="pickled model or .knnz model file")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--data", default="heart.csv")
+    parser.add_argument("--rows", type=int, default=32, help="heart.csv rows to warm up with")
+    parser.add_argument("--ready-file", help="touch this file once warm (for readiness probes)")
+    args = parser.parse_args(argv)
+
+    try:
+        _, report = preload(args.model, args.scaler, args.data, args.rows)
+    except (OSError, ValueError) as e:
+        print(json.dumps({"ready": False, "error": str(e)}))
+        sys.exit(1)
+    print(json.dumps(report, indent=2))
+    if args.ready_file:
+        with open(args.ready_file, "w") as f:
+            json.dump(report, f)
+
+
+if __name__ == "__main__":
+    main()